@@ -0,0 +1,59 @@
+"""
+Compare ktsutils.angles against astropy.coordinates.Angle for decoding
+RAJ2000/DEJ2000-style string columns at 10^4 to 10^7 rows.
+"""
+import argparse
+
+from astropy.coordinates import Angle
+import numpy as np
+
+from benchmarks.timing import best_time, print_table
+from ktsutils.angles import dms_to_degrees, hms_to_degrees
+from ktsutils.synthetic import random_sexagesimal
+
+
+def run(sizes, angle_max, repeat):
+    rows = []
+    for n in sizes:
+        for kind, fast, unit in (
+            ("ra", hms_to_degrees, "hour"), ("dec", dms_to_degrees, "deg")
+        ):
+            strings = random_sexagesimal(n, kind).astype("U")
+            fast_time, fast_out = best_time(fast, strings, repeat=repeat)
+            row = {
+                "rows": n,
+                "column": kind,
+                "fast_s": fast_time,
+                "fast_rows/s": n / fast_time,
+                "angle_s": "-",
+                "speedup": "-",
+                "identical": "-",
+            }
+            if n <= angle_max:
+                angle_time, angle_out = best_time(
+                    lambda s: Angle(s, unit=unit).degree, strings, repeat=1
+                )
+                row["angle_s"] = angle_time
+                row["speedup"] = angle_time / fast_time
+                row["identical"] = np.array_equal(fast_out, angle_out)
+            rows.append(row)
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7],
+    )
+    parser.add_argument(
+        "--angle-max",
+        type=int,
+        default=10 ** 5,
+        help="largest size to also run through Angle (it is slow)",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.angle_max, args.repeat)
@@ -0,0 +1,79 @@
+"""
+Compare fitting shapes to every label one full-frame `labels == label`
+mask at a time (as in the morphology_snippet.ipynb examples) against
+ktsutils.opencv.label_shapes(), which works on bounding-box crops.
+"""
+import argparse
+
+import numpy as np
+import scipy.ndimage as ndi
+
+from benchmarks.labels import blob_frame
+from benchmarks.timing import best_time, print_table
+from ktsutils.opencv import label_shapes, shape_params
+
+
+def per_label_shapes(labels, label_ids):
+    """The original approach: a full-frame mask per label."""
+    shapes = {}
+    for label in label_ids:
+        mask = (labels == label).astype('u1')
+        shapes[label] = {
+            shape: shape_params(mask, shape)
+            for shape in ("circle", "triangle", "rectangle")
+        }
+    return shapes
+
+
+def run(label_counts, shape, repeat, per_label_max):
+    rows = []
+    for n_blobs in label_counts:
+        labels, n_labels = ndi.label(blob_frame(n_blobs, shape))
+        label_ids = np.arange(1, n_labels + 1)
+        batch_time, table = best_time(label_shapes, labels, repeat=repeat)
+        row = {
+            "labels": n_labels,
+            "label_shapes_s": batch_time,
+            "per_label_s": "-",
+            "speedup": "-",
+            "same_circles": "-",
+        }
+        if n_labels <= per_label_max:
+            loop_time, reference = best_time(
+                per_label_shapes, labels, label_ids, repeat=1
+            )
+            row["per_label_s"] = loop_time
+            row["speedup"] = loop_time / batch_time
+            row["same_circles"] = all(
+                np.allclose(
+                    [circle["cx"], circle["cy"], circle["r"]],
+                    table.loc[l, ["cx", "cy", "r"]].to_numpy(float),
+                )
+                for l in label_ids
+                for circle in (reference[l]["circle"],)
+            )
+        rows.append(row)
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--labels",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000],
+        help="approximate number of labels per frame",
+    )
+    parser.add_argument(
+        "--shape", type=int, nargs=2, default=[1000, 1000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--per-label-max",
+        type=int,
+        default=1000,
+        help="largest label count to also run the per-label version on",
+    )
+    args = parser.parse_args()
+    run(args.labels, tuple(args.shape), args.repeat, args.per_label_max)
@@ -0,0 +1,96 @@
+"""
+Compare per-label np.nonzero() indexing (the original indexed_label()
+from morphology_snippet.ipynb) against ktsutils.labels.label_index() on
+frames with 10 to 10,000 labels, checking that both give the same
+pixels for every label, background included.
+"""
+import argparse
+
+import numpy as np
+import scipy.ndimage as ndi
+
+from benchmarks.timing import best_time, print_table
+from ktsutils.fullness import moon_pixels
+from ktsutils.labels import label_index
+
+
+def nonzero_indexed_label(labels, n_labels):
+    """The original approach: one full-image scan per label."""
+    label_indices = {}
+    for l in range(n_labels + 1):
+        y_indices, x_indices = np.nonzero(labels == l)
+        label_indices[l] = {'y': y_indices, 'x': x_indices}
+    return label_indices
+
+
+def blob_frame(n_blobs, shape, seed=0):
+    """
+    A boolean frame with roughly `n_blobs` separate square blobs scattered
+    over it, a bit like a noisy thresholded GOES frame.
+    """
+    rng = np.random.default_rng(seed)
+    frame = np.zeros(shape, dtype=bool)
+    # lay blobs out on a jittered grid so they mostly don't touch
+    per_side = int(np.ceil(np.sqrt(n_blobs)))
+    cell = min(shape) // per_side
+    size = max(1, cell // 3)
+    for i in range(n_blobs):
+        row, col = divmod(i, per_side)
+        y = row * cell + rng.integers(0, max(1, cell - size))
+        x = col * cell + rng.integers(0, max(1, cell - size))
+        frame[y:y + size, x:x + size] = True
+    return frame
+
+
+def run(label_counts, shape, repeat, nonzero_max):
+    rows = []
+    for n_blobs in label_counts:
+        labels, n_labels = ndi.label(blob_frame(n_blobs, shape))
+        fast_time, index = best_time(
+            label_index, labels, n_labels, repeat=repeat
+        )
+        row = {
+            "labels": n_labels,
+            "label_index_s": fast_time,
+            "nonzero_s": "-",
+            "speedup": "-",
+            "identical": "-",
+        }
+        if n_labels <= nonzero_max:
+            slow_time, reference = best_time(
+                nonzero_indexed_label, labels, n_labels, repeat=1
+            )
+            row["nonzero_s"] = slow_time
+            row["speedup"] = slow_time / fast_time
+            row["identical"] = all(
+                np.array_equal(reference[l]['y'], pixels['y'])
+                and np.array_equal(reference[l]['x'], pixels['x'])
+                # including the background, which moon_pixels() derives
+                for l in range(n_labels + 1)
+                for pixels in (moon_pixels(index, l),)
+            )
+        rows.append(row)
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--labels",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1000, 10000],
+        help="approximate number of labels per frame",
+    )
+    parser.add_argument(
+        "--shape", type=int, nargs=2, default=[1000, 1000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--nonzero-max",
+        type=int,
+        default=10000,
+        help="largest label count to also run the per-label version on",
+    )
+    args = parser.parse_args()
+    run(args.labels, tuple(args.shape), args.repeat, args.nonzero_max)
@@ -0,0 +1,111 @@
+"""
+Compare coarse-to-fine Moon finding (ktsutils.localize.localized_fullness)
+against the full-frame fullness_algorithm() on synthetic LUN-like frames:
+speedup, how often the two agree, and how often the coarse pass had to
+fall back to the full frame.
+"""
+import argparse
+
+import numpy as np
+
+from benchmarks.timing import best_time, print_table
+from ktsutils.fullness import fullness_algorithm
+from ktsutils.localize import localized_fullness
+
+PARAMS = {
+    "threshold": 40,
+    "erosion_size": 3,
+    "min_width": 20,
+    "min_height": 20,
+    "edge_size": 5,
+    "dilation_size": 3,
+    "cutout_margin": 5,
+}
+
+
+def moon_frame(shape, rng):
+    """
+    A noisy dark frame with a partly lit disk somewhere in it, a few hot
+    pixels, and sometimes a second, smaller bright blob.
+    """
+    frame = rng.normal(5, 2, shape).astype("f4")
+    y, x = np.ogrid[:shape[0], :shape[1]]
+    blobs = 1 + (rng.random() < 0.2)
+    for _ in range(blobs):
+        radius = rng.integers(15, min(shape) // 8)
+        cy = rng.integers(radius, shape[0] - radius)
+        cx = rng.integers(radius, shape[1] - radius)
+        terminator = rng.integers(-radius, radius)
+        disk = (y - cy) ** 2 + (x - cx) ** 2 < radius ** 2
+        frame[disk & (x - cx > terminator)] += 100
+    hot = rng.integers(0, frame.size, 100)
+    frame.flat[hot] = 200
+    return frame
+
+
+def same_result(full, local):
+    if full["status"] != local["status"]:
+        return False
+    if full["status"] != "ok":
+        return True
+    return np.array_equal(full["moonmask"], local["moonmask"])
+
+
+def run(shapes, n_frames, factor, repeat, seed):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for shape in shapes:
+        frames = [moon_frame(shape, rng) for _ in range(n_frames)]
+        full_time, full_results = best_time(
+            lambda: [fullness_algorithm(f, **PARAMS) for f in frames],
+            repeat=repeat,
+        )
+        local_time, local_results = best_time(
+            lambda: [
+                localized_fullness(f, **PARAMS, factor=factor)
+                for f in frames
+            ],
+            repeat=repeat,
+        )
+        rows.append(
+            {
+                "shape": f"{shape[0]}x{shape[1]}",
+                "frames": n_frames,
+                "full_s": full_time,
+                "coarse_s": local_time,
+                "speedup": full_time / local_time,
+                "agree": np.mean(
+                    [
+                        same_result(f, l)
+                        for f, l in zip(full_results, local_results)
+                    ]
+                ),
+                "fell_back": np.mean(
+                    [l["mode"] == "full" for l in local_results]
+                ),
+            }
+        )
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[500, 1000, 2000],
+        help="frame edge lengths in pixels",
+    )
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--factor", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(
+        [(s, s) for s in args.sizes],
+        args.frames,
+        args.factor,
+        args.repeat,
+        args.seed,
+    )
@@ -0,0 +1,67 @@
+"""
+Median filtering a large 8-bit frame with striped scanlines (like lesson
+6's Viking Orbiter image): one ndi.median_filter() call vs.
+ktsutils.median.tiled_median_filter() on a process pool and the
+histogram-based box_median_filter(), for several box footprints.
+"""
+import argparse
+import os
+
+import numpy as np
+import scipy.ndimage as ndi
+
+from benchmarks.timing import best_time, print_table
+from ktsutils.median import box_median_filter, tiled_median_filter
+
+
+def scanline_frame(shape, seed=0):
+    """Smooth 8-bit terrain with bright and dark scanline dropouts."""
+    rng = np.random.default_rng(seed)
+    y, x = np.ogrid[:shape[0], :shape[1]]
+    terrain = 128 + 60 * np.sin(x / 40) * np.cos(y / 55)
+    frame = terrain + rng.normal(0, 8, shape)
+    frame[rng.random(shape[0]) < 0.03] = 255
+    frame[rng.random(shape[0]) < 0.03] = 0
+    return np.clip(frame, 0, 255).astype("u1")
+
+
+def run(sizes, shape, tile, n_workers, repeat):
+    frame = scanline_frame(shape)
+    rows = []
+    for size in sizes:
+        scipy_time, expected = best_time(
+            ndi.median_filter, frame, size=size, repeat=repeat
+        )
+        tiled_time, tiled = best_time(
+            tiled_median_filter,
+            frame,
+            size,
+            tile_shape=tile,
+            n_workers=n_workers,
+            repeat=repeat,
+        )
+        histogram_time, histogram = best_time(
+            box_median_filter, frame, size, repeat=repeat
+        )
+        rows.append(
+            {
+                "footprint": size,
+                "scipy_s": scipy_time,
+                "tiled_s": tiled_time,
+                "histogram_s": histogram_time,
+                "identical": np.array_equal(expected, tiled)
+                and np.array_equal(expected, histogram),
+            }
+        )
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 10, 25])
+    parser.add_argument("--shape", type=int, nargs=2, default=[1024, 1024])
+    parser.add_argument("--tile", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args()
+    run(args.sizes, tuple(args.shape), args.tile, args.workers, args.repeat)
@@ -0,0 +1,67 @@
+"""
+Binary erosion and dilation with square np.ones((n, n)) footprints:
+scipy.ndimage vs. the separable ktsutils.morphology.box_erosion() /
+box_dilation(), for footprints from 3 to 50 pixels on GOES-sized frames.
+"""
+import argparse
+
+import numpy as np
+import scipy.ndimage as ndi
+
+from benchmarks.timing import best_time, print_table
+from ktsutils.morphology import box_dilation, box_erosion
+
+
+def moon_frame(shape, seed=0):
+    """A thresholded frame: a noisy disk on a speckled background."""
+    rng = np.random.default_rng(seed)
+    y, x = np.ogrid[:shape[0], :shape[1]]
+    radius = min(shape) / 4
+    disk = (y - shape[0] / 2) ** 2 + (x - shape[1] / 2) ** 2 < radius ** 2
+    return (disk & (rng.random(shape) < 0.98)) | (rng.random(shape) < 0.02)
+
+
+OPERATIONS = {
+    "erosion": (ndi.binary_erosion, box_erosion),
+    "dilation": (ndi.binary_dilation, box_dilation),
+}
+
+
+def run(sizes, shape, repeat):
+    frame = moon_frame(shape)
+    rows = []
+    for size in sizes:
+        footprint = np.ones((size, size))
+        for name, (scipy_op, box_op) in OPERATIONS.items():
+            scipy_time, expected = best_time(
+                scipy_op, frame, footprint, repeat=repeat
+            )
+            box_time, result = best_time(box_op, frame, size, repeat=repeat)
+            rows.append(
+                {
+                    "footprint": size,
+                    "operation": name,
+                    "scipy_s": scipy_time,
+                    "box_s": box_time,
+                    "speedup": scipy_time / box_time,
+                    "identical": np.array_equal(expected, result),
+                }
+            )
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[3, 5, 10, 15, 25, 50]
+    )
+    parser.add_argument(
+        "--shape",
+        type=int,
+        nargs=2,
+        default=[2000, 2000],
+        help="frame shape (GOES ABI 1 km channels are 5424 x 5424)",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, tuple(args.shape), args.repeat)
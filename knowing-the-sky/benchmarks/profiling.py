@@ -0,0 +1,79 @@
+"""
+Overhead of the ktsutils.profiling stage instrumentation in
+fullness_algorithm(): disabled (the default), timing only, and timing
+plus tracemalloc memory tracking, followed by the per-stage breakdown.
+"""
+import argparse
+
+import pandas as pd
+
+from benchmarks.morphology import moon_frame
+from benchmarks.timing import best_time, print_table
+from ktsutils.fullness import fullness_algorithm
+from ktsutils.profiling import (
+    profiling,
+    stage_records,
+    stage_summary,
+    stage_timer,
+)
+
+PARAMS = {
+    "threshold": 0.5,
+    "erosion_size": 3,
+    "min_width": 10,
+    "min_height": 10,
+    "edge_size": 5,
+    "dilation_size": 3,
+    "cutout_margin": 5,
+    "draw_circle": False,
+}
+
+
+def frames(image, n_frames):
+    for _ in range(n_frames):
+        fullness_algorithm(image, **PARAMS)
+
+
+def empty_stages(n_stages):
+    for _ in range(n_stages):
+        with stage_timer("empty"):
+            pass
+
+
+def run(size, n_frames, repeat):
+    image = moon_frame((size, size)).astype("f4")
+    rows = []
+    stage_time, _ = best_time(empty_stages, 100_000, repeat=repeat)
+    disabled, _ = best_time(frames, image, n_frames, repeat=repeat)
+    rows.append(
+        {
+            "profiling": "disabled",
+            "ms/frame": disabled / n_frames * 1000,
+            "overhead": f"{stage_time / 100_000 * 1e9:.0f} ns/stage",
+        }
+    )
+    records = []
+    for name, memory in (("time", False), ("time + memory", True)):
+        with profiling(memory=memory) as profiler:
+            seconds, _ = best_time(frames, image, n_frames, repeat=repeat)
+        records = profiler.records
+        rows.append(
+            {
+                "profiling": name,
+                "ms/frame": seconds / n_frames * 1000,
+                "overhead": f"{seconds / disabled - 1:.1%}",
+            }
+        )
+    print_table(rows, list(rows[0].keys()))
+    print()
+    with pd.option_context("display.width", 120, "display.max_columns", None):
+        print(stage_summary(stage_records(records)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.size, args.frames, args.repeat)
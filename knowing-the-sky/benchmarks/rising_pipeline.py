@@ -0,0 +1,80 @@
+"""
+Measure throughput (stars/second) and peak memory of the chunked
+rising-azimuth pipeline on synthetic catalogs of 10^5 to 10^7 stars.
+"""
+import argparse
+import time
+import tracemalloc
+
+import astropy.units as u
+from astropy.coordinates import EarthLocation
+
+from benchmarks.timing import print_table
+from ktsutils.rising import night_times, run_rising_pipeline
+from ktsutils.synthetic import iter_synthetic_catalog
+
+# the lesson 3 observing location
+SEATTLE = EarthLocation(lat=47.6062 * u.deg, lon=-122.3321 * u.deg)
+
+
+def run(sizes, start, stop, step_minutes, memory_budget, trace_memory):
+    times = night_times(SEATTLE, start, stop, step_minutes)
+    print(f"{len(times)} night-time samples from {start} to {stop}")
+    rows = []
+    for n in sizes:
+        if trace_memory:
+            tracemalloc.start()
+        began = time.perf_counter()
+        results = run_rising_pipeline(
+            iter_synthetic_catalog(n, chunksize=10 ** 6),
+            SEATTLE,
+            times,
+            memory_budget=memory_budget,
+        )
+        elapsed = time.perf_counter() - began
+        row = {
+            "stars": n,
+            "seconds": elapsed,
+            "stars/s": n / elapsed,
+            "rising": int((results["n_rises"] > 0).sum()),
+            "peak_MB": "-",
+        }
+        if trace_memory:
+            row["peak_MB"] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            tracemalloc.stop()
+        rows.append(row)
+        del results
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10 ** 5, 10 ** 6, 10 ** 7],
+    )
+    parser.add_argument("--start", default="2024-01-01")
+    parser.add_argument("--stop", default="2025-01-20")
+    parser.add_argument("--step-minutes", type=int, default=60)
+    parser.add_argument(
+        "--memory-budget-mb",
+        type=int,
+        default=256,
+        help="working memory for each chunk of stars",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="also report peak traced memory (slows things down a little)",
+    )
+    args = parser.parse_args()
+    run(
+        args.sizes,
+        args.start,
+        args.stop,
+        args.step_minutes,
+        args.memory_budget_mb * 1024 ** 2,
+        args.trace_memory,
+    )
@@ -0,0 +1,75 @@
+"""
+Per-call latency and memory allocated by ktsutils.opencv.mask2shape()
+(which always draws) vs. the geometry-only shape_params() and
+mask_geometry(), on Moon-sized and full-frame masks.
+"""
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from benchmarks.timing import best_time, print_table
+from ktsutils.opencv import mask2shape, mask_geometry, shape_params
+
+
+def moon_mask(size, radius_fraction=0.35, seed=0):
+    """A `size` x `size` u1 mask of a partly lit disk."""
+    rng = np.random.default_rng(seed)
+    y, x = np.ogrid[:size, :size]
+    radius = size * radius_fraction
+    center = size / 2
+    disk = (y - center) ** 2 + (x - center) ** 2 < radius ** 2
+    terminator = rng.uniform(-radius, radius)
+    return (disk & (x - center > terminator)).astype("u1")
+
+
+def allocated(func, *args, **kwargs):
+    """Peak memory allocated through Python during one call, in bytes."""
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+CALLS = {
+    "mask2shape": lambda m: mask2shape(m, draw_on_array=True),
+    "shape_params": lambda m: shape_params(m, "circle"),
+    "mask_geometry": mask_geometry,
+}
+
+
+def run(sizes, repeat, calls_per_timing):
+    rows = []
+    for size in sizes:
+        mask = moon_mask(size)
+        for name, call in CALLS.items():
+            seconds, _ = best_time(
+                lambda: [call(mask) for _ in range(calls_per_timing)],
+                repeat=repeat,
+            )
+            rows.append(
+                {
+                    "mask": f"{size}x{size}",
+                    "call": name,
+                    "us/call": seconds / calls_per_timing * 1e6,
+                    "alloc_KB": allocated(call, mask) / 1024,
+                }
+            )
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[128, 512, 2000],
+        help="mask edge lengths: Moon cutouts up to full frames",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat, args.calls)
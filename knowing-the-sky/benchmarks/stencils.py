@@ -0,0 +1,82 @@
+"""
+Compare the lesson 6 `labelstencil()` (np.tile() + np.isin() + np.where())
+against ktsutils.stencil.labelstencil() (broadcasting + lookup table),
+with and without a preallocated output buffer, on large RGB images.
+"""
+import argparse
+import tracemalloc
+
+import numpy as np
+import scipy.ndimage as ndi
+
+from benchmarks.timing import best_time, print_table
+from ktsutils.stencil import labelstencil
+
+
+def tile_apply_2d_stencil(color_image, stencil_2d):
+    stencil_3d = np.moveaxis(np.tile(stencil_2d, (3, 1, 1)), 0, 2)
+    return np.where(stencil_3d, color_image, 0)
+
+
+def tile_labelstencil(color_image, label_array, label_numbers):
+    """The lesson 6 version."""
+    return tile_apply_2d_stencil(
+        color_image, np.isin(label_array, label_numbers)
+    )
+
+
+def peak_allocated(func, *args, **kwargs):
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(sizes, n_chosen, repeat, seed):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for size in sizes:
+        image = rng.integers(0, 256, (size, size, 3), dtype="u1")
+        labels, n_labels = ndi.label(rng.random((size, size)) > 0.6)
+        chosen = rng.choice(np.arange(1, n_labels + 1), n_chosen)
+        out = np.empty_like(image)
+        calls = {
+            "tile": lambda: tile_labelstencil(image, labels, chosen),
+            "broadcast": lambda: labelstencil(image, labels, chosen),
+            "broadcast_out": lambda: labelstencil(
+                image, labels, chosen, out=out
+            ),
+        }
+        reference = calls["tile"]()
+        for name, call in calls.items():
+            seconds, result = best_time(call, repeat=repeat)
+            rows.append(
+                {
+                    "image": f"{size}x{size}x3",
+                    "labels": n_labels,
+                    "call": name,
+                    "seconds": seconds,
+                    "alloc_MB": peak_allocated(call) / 1024 ** 2,
+                    "identical": np.array_equal(result, reference),
+                }
+            )
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 2000, 4000]
+    )
+    parser.add_argument(
+        "--chosen",
+        type=int,
+        default=500,
+        help="number of labels to keep in the stencil",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, args.chosen, args.repeat, args.seed)
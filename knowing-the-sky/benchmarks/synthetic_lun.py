@@ -0,0 +1,131 @@
+"""
+Throughput and accuracy of fullness_algorithm() on synthetic LUN frames
+with known illuminated fractions (ktsutils.synthetic), at archive
+scales of 10^3 to 10^5 frames.
+
+By default frames are rendered in memory and fed straight to
+fullness_algorithm(), timing only the pipeline. With --write FOLDER,
+they're written to FOLDER as NetCDF files laid out like the real LUN
+files, and the whole archive is run
+through ktsutils.batch.run_fullness_batch(), so the timing includes
+reading files and uses every worker. Frame i is the same whatever the
+archive size, so files already in FOLDER are reused by later runs (use
+a separate folder for each --shape).
+"""
+import argparse
+from pathlib import Path
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.timing import print_table
+from ktsutils.batch import run_fullness_batch
+from ktsutils.fullness import fullness_algorithm
+from ktsutils.synthetic import (
+    iter_synthetic_moons,
+    synthetic_moon_table,
+    write_synthetic_lun,
+)
+
+PARAMS = {
+    "threshold": 20,
+    "erosion_size": 3,
+    "min_width": 10,
+    "min_height": 10,
+    "edge_size": 5,
+    "dilation_size": 3,
+    "cutout_margin": 5,
+}
+
+
+def measure_in_memory(table, shape):
+    """Pipeline results for every frame, and the seconds spent in it."""
+    records, seconds = [], 0
+    for frame, image in iter_synthetic_moons(table, shape):
+        start = time.perf_counter()
+        result = fullness_algorithm(image, **PARAMS, draw_circle=False)
+        seconds += time.perf_counter() - start
+        records.append(
+            {
+                "name": frame["name"],
+                "status": result["status"],
+                "fullness": result.get("fullness", np.nan),
+            }
+        )
+    return pd.DataFrame(records), seconds
+
+
+def measure_files(table, shape, folder, n_workers):
+    """Like measure_in_memory(), but via NetCDF files and the batch runner."""
+    missing = table.loc[
+        [not (Path(folder) / name).exists() for name in table["name"]]
+    ]
+    write_synthetic_lun(folder, missing, shape)
+    results, stats = run_fullness_batch(
+        table[["name"]], folder, PARAMS, n_workers=n_workers
+    )
+    return results[["name", "status", "fullness"]], stats["wall_s"]
+
+
+def accuracy(table, results):
+    """
+    How often the Moon was found in unclipped frames (and wrongly found
+    in clipped ones), and the error of the fullness measured in the
+    unclipped frames where it was found.
+    """
+    merged = table.merge(results, on="name")
+    found = merged["status"] == "ok"
+    clipped = merged["clipped"]
+    error = (merged["fullness"] - merged["illuminated_fraction"])[
+        found & ~clipped
+    ]
+    return {
+        "found": found[~clipped].mean(),
+        "found_clipped": found[clipped].mean() if clipped.any() else 0,
+        "bias": error.mean(),
+        "mean_abs_err": error.abs().mean(),
+        "p95_abs_err": error.abs().quantile(0.95),
+    }
+
+
+def run(sizes, shape, write, n_workers):
+    rows = []
+    for n in sizes:
+        table = synthetic_moon_table(n, shape=shape, radius_range=(20, 60))
+        if write is None:
+            results, seconds = measure_in_memory(table, shape)
+        else:
+            results, seconds = measure_files(table, shape, write, n_workers)
+        rows.append(
+            {"frames": n, "seconds": seconds, "frames/s": n / seconds}
+            | accuracy(table, results)
+        )
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10 ** 3, 10 ** 4, 10 ** 5]
+    )
+    parser.add_argument(
+        "--shape",
+        type=int,
+        nargs=2,
+        default=[256, 1024],
+        help="frame shape (real LUN frames are 676 x 2808)",
+    )
+    parser.add_argument(
+        "--write",
+        type=Path,
+        default=None,
+        help=(
+            "folder to write NetCDF files to and run the batch runner on; "
+            "each frame takes about 3.5 bytes per pixel on disk, so the "
+            "default sizes and shape need about 90 GB"
+        ),
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+    run(args.sizes, tuple(args.shape), args.write, args.workers)
@@ -0,0 +1,80 @@
+"""
+Choosing a threshold for every frame from cached histograms
+(ktsutils.thresholds.frame_thresholds()) vs. recomputing a percentile
+from every frame's pixels, on synthetic Moon frames.
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.timing import best_time, print_table
+from ktsutils.thresholds import (
+    THRESHOLD_METHODS,
+    frame_histogram,
+    frame_thresholds,
+)
+
+
+def moon_frames(n_frames, size, seed=0):
+    """Noisy dark frames with a bright disk of varying size and level."""
+    rng = np.random.default_rng(seed)
+    y, x = np.ogrid[:size, :size]
+    for _ in range(n_frames):
+        frame = rng.normal(5, 1, (size, size)).astype("f4")
+        radius = rng.uniform(0.05, 0.2) * size
+        disk = (y - size / 2) ** 2 + (x - size / 2) ** 2 < radius ** 2
+        frame[disk] += rng.uniform(40, 120)
+        yield frame
+
+
+def pixel_percentiles(frames, q):
+    return [np.percentile(frame, q) for frame in frames]
+
+
+def run(n_frames, size, repeat):
+    frames = list(moon_frames(n_frames, size))
+    histogram_time, records = best_time(
+        lambda: [frame_histogram(frame) for frame in frames], repeat=repeat
+    )
+    histograms = pd.DataFrame(records)
+    histograms.insert(0, "name", [f"frame{i}" for i in range(n_frames)])
+    pixel_time, exact = best_time(
+        pixel_percentiles, frames, 99.5, repeat=repeat
+    )
+    rows = [
+        {
+            "method": "pixel percentile (no cache)",
+            "us/frame": pixel_time / n_frames * 1e6,
+            "max_error": 0,
+        },
+        {
+            "method": "histogram (build cache once)",
+            "us/frame": histogram_time / n_frames * 1e6,
+            "max_error": "-",
+        },
+    ]
+    for method in THRESHOLD_METHODS:
+        seconds, thresholds = best_time(
+            frame_thresholds, histograms, method, repeat=repeat
+        )
+        error = "-"
+        if method == "percentile":
+            error = np.abs(thresholds.to_numpy() - exact).max()
+        rows.append(
+            {
+                "method": f"{method} from cache",
+                "us/frame": seconds / n_frames * 1e6,
+                "max_error": error,
+            }
+        )
+    print_table(rows, list(rows[0].keys()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.frames, args.size, args.repeat)
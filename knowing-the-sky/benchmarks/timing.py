@@ -0,0 +1,31 @@
+"""Small shared helpers for the benchmark scripts in this folder."""
+import time
+
+
+def best_time(func, *args, repeat=3, **kwargs):
+    """
+    Call `func(*args, **kwargs)` `repeat` times. Return the shortest
+    wall-clock time in seconds along with the result of the last call.
+    """
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def print_table(rows, columns):
+    """Print a list of dicts as a plain fixed-width table."""
+    widths = {
+        c: max(len(c), *(len(_fmt(r[c])) for r in rows)) for c in columns
+    }
+    print("  ".join(c.rjust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(_fmt(r[c]).rjust(widths[c]) for c in columns))
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
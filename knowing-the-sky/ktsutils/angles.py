@@ -0,0 +1,188 @@
+"""
+Bulk conversion of fixed-layout sexagesimal strings (like the "hh mm ss.s"
+and "+dd mm ss" columns VizieR gives us for the Bright Star Catalog) to
+decimal degrees.
+"""
+import astropy.units as u
+from astropy.coordinates import Angle
+import numpy as np
+
+# astropy converts hourangle to degrees by multiplying by this factor, which
+# is _not_ exactly 15.0. We use the same one so that our results match
+# Angle(..., unit='hour').degree bit-for-bit.
+HOURANGLE_TO_DEG = u.hourangle.to(u.deg)
+
+_ZERO, _SPACE, _PLUS, _MINUS, _DOT = map(ord, "0 +-.")
+
+
+def _code_matrix(strings):
+    """
+    Represent a sequence of strings as a 2-D array of character codes with
+    one row per string, right-padded with 0. Missing values (None, NaN)
+    become empty rows. This is a view of the original data when `strings`
+    is already a numpy bytes or unicode array.
+    """
+    arr = np.asarray(strings)
+    if arr.dtype.kind == "O":
+        arr = np.where(
+            [isinstance(s, str) for s in arr], arr, ""
+        ).astype("U")
+    elif arr.dtype.kind not in "SU":
+        arr = arr.astype("U")
+    arr = np.ascontiguousarray(arr)
+    # numpy stores unicode strings as fixed-width UCS-4
+    code = "u1" if arr.dtype.kind == "S" else "u4"
+    width = arr.dtype.itemsize // np.dtype(code).itemsize
+    if width == 0:
+        return np.zeros((len(arr), 0), code)
+    return arr.view(code).reshape(len(arr), width)
+
+
+def _infer_layout(row):
+    """
+    Find the positions of the fields in a single row of character codes
+    representing a sexagesimal string like '+45 13 45' or '00 05 09.9'.
+    Returns None if it doesn't look like three separated fields.
+    """
+    text = "".join(map(chr, row)).rstrip("\x00 ")
+    signed = text[:1] in ("+", "-")
+    body = text[1:] if signed else text
+    sep = next((c for c in body if not c.isdigit()), None)
+    if sep is None or sep == ".":
+        return None
+    fields = body.split(sep)
+    if len(fields) != 3 or not all(f[:1].isdigit() for f in fields):
+        return None
+    whole, _, frac = fields[2].partition(".")
+    if not (fields[0].isdigit() and fields[1].isdigit() and whole.isdigit()):
+        return None
+    if frac and not frac.isdigit():
+        return None
+    start = int(signed)
+    d_stop = start + len(fields[0])
+    m_stop = d_stop + 1 + len(fields[1])
+    s_stop = m_stop + 1 + len(whole)
+    return {
+        "signed": signed,
+        "sep": ord(sep),
+        "d": (start, d_stop),
+        "m": (d_stop + 1, m_stop),
+        "s": (m_stop + 1, s_stop),
+        "frac": (s_stop + 1, s_stop + 1 + len(frac)) if frac else None,
+        "width": s_stop + (1 + len(frac) if frac else 0),
+    }
+
+
+def _digits(block):
+    """
+    Interpret each row of a 2-D block of ASCII digit codes as an integer.
+    Returns the integers and a boolean array that is False for rows
+    containing non-digits.
+    """
+    digits = block.astype(np.int64) - _ZERO
+    ok = ((digits >= 0) & (digits <= 9)).all(axis=1)
+    weights = 10 ** np.arange(block.shape[1] - 1, -1, -1, dtype=np.int64)
+    return digits @ weights, ok
+
+
+def sexagesimal_to_degrees(strings, unit="deg"):
+    """
+    Convert a sequence of fixed-layout sexagesimal strings to a float64 array
+    of decimal degrees. `unit` gives the unit of the first field: "deg" for
+    strings like "+45 13 45" and "hour" for strings like "00 05 09.9".
+
+    The field layout is taken from the first non-blank string. Every string
+    that matches it is decoded in bulk with array operations; blank or
+    missing strings become NaN; anything else (including out-of-range
+    values) is handed to astropy's Angle, so the output always matches
+    `Angle(strings, unit=unit).degree` exactly.
+    """
+    if unit not in ("deg", "hour"):
+        raise ValueError("unit can be 'deg' or 'hour'.")
+    raw = _code_matrix(strings)
+    n_rows, width = raw.shape
+    out = np.full(n_rows, np.nan)
+    blank = ((raw == 0) | (raw == _SPACE)).all(axis=1)
+    if blank.all():
+        return out
+    # strip leading spaces so that e.g. ' 5 10 20' and '05 10 20' line up
+    # with a template computed from either one
+    lead = np.argmax((raw != _SPACE), axis=1)
+    if lead.any():
+        shift = np.arange(width) + lead[:, None]
+        raw = np.where(
+            shift < width, raw[np.arange(n_rows)[:, None], shift % width], 0
+        ).astype(raw.dtype)
+    layout = _infer_layout(raw[np.argmax(~blank)])
+    fast = ~blank
+    if layout is None or width < layout["width"]:
+        fast[:] = False
+    else:
+        # anything trailing the template other than padding disqualifies
+        # a row from the fast path
+        tail = raw[:, layout["width"]:]
+        fast &= ((tail == 0) | (tail == _SPACE)).all(axis=1)
+        fast &= raw[:, layout["d"][1]] == layout["sep"]
+        fast &= raw[:, layout["m"][1]] == layout["sep"]
+        if layout["frac"] is not None:
+            fast &= raw[:, layout["s"][1]] == _DOT
+    if fast.any():
+        rows = raw[fast]
+        if layout["signed"]:
+            sign_char = rows[:, 0]
+            negative = sign_char == _MINUS
+            sign_ok = negative | (sign_char == _PLUS)
+        else:
+            negative = np.zeros(len(rows), bool)
+            sign_ok = np.ones(len(rows), bool)
+        d, d_ok = _digits(rows[:, slice(*layout["d"])])
+        m, m_ok = _digits(rows[:, slice(*layout["m"])])
+        s, s_ok = _digits(rows[:, slice(*layout["s"])])
+        if layout["frac"] is not None:
+            frac, f_ok = _digits(rows[:, slice(*layout["frac"])])
+            n_frac = layout["frac"][1] - layout["frac"][0]
+            # integer division by a power of ten is correctly rounded, so
+            # this is exactly float("ss.sss")
+            seconds = (s * 10 ** n_frac + frac) / 10.0 ** n_frac
+        else:
+            f_ok = True
+            seconds = s.astype(np.float64)
+        # Angle raises or warns on out-of-range fields; leave those rows
+        # to it so its behavior is preserved
+        in_range = (m < 60) & (seconds < 60)
+        if unit == "hour":
+            in_range &= d < 24
+        ok = sign_ok & d_ok & m_ok & s_ok & f_ok & in_range
+        # same order of operations as astropy's parser
+        value = np.abs(d.astype(np.float64)) + m / 60.0 + seconds / 3600.0
+        value = np.where(negative, -value, value)
+        if unit == "hour":
+            value = value * HOURANGLE_TO_DEG
+        fast_ix = np.flatnonzero(fast)
+        out[fast_ix[ok]] = value[ok]
+        fast[fast_ix[~ok]] = False
+    slow = ~(fast | blank)
+    if slow.any():
+        # blanks and NaNs are handled above, so everything here is
+        # a string
+        leftovers = np.asarray(strings)[slow]
+        if leftovers.dtype.kind == "S":
+            leftovers = np.char.decode(leftovers, "ascii", "replace")
+        out[slow] = Angle(leftovers.astype(str), unit=unit).degree
+    return out
+
+
+def hms_to_degrees(strings):
+    """
+    Convert "hh mm ss.s" strings (e.g. RAJ2000) to decimal degrees.
+    Equivalent to `Angle(strings, unit='hour').degree`.
+    """
+    return sexagesimal_to_degrees(strings, "hour")
+
+
+def dms_to_degrees(strings):
+    """
+    Convert "+dd mm ss" strings (e.g. DEJ2000) to decimal degrees.
+    Equivalent to `Angle(strings, unit='deg').degree`.
+    """
+    return sexagesimal_to_degrees(strings, "deg")
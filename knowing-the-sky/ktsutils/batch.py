@@ -0,0 +1,210 @@
+"""
+Run the lunar fullness pipeline over every file in a LUN index (like
+indices/lun_index.csv) in parallel, collecting one row of results per
+image.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import nullcontext
+from itertools import chain
+import os
+from pathlib import Path
+import time
+
+import numpy as np
+import pandas as pd
+
+from ktsutils.fullness import fullness_algorithm, load_goes_image
+from ktsutils.masks import rle_encode
+from ktsutils.profiling import profiling, set_frame, stage_records, stage_timer
+
+
+def process_file(path, params, keep_masks=False, profile=False):
+    """
+    Load one GOES LUN file and run fullness_algorithm() on it with the
+    keyword arguments in `params`. Never raises: a failure is recorded in
+    the returned dict instead. 'error' is None for images where the Moon
+    was found, the status (e.g. 'no Moon') for images where it wasn't, and
+    the exception for images that couldn't be processed at all. If
+    `keep_masks` is True, 'moonmask' holds the Moon mask, run-length
+    encoded with ktsutils.masks.rle_encode() (None if there isn't one).
+    If `profile` is True, 'stages' holds the per-stage records of a
+    ktsutils.profiling.StageProfiler (timing and memory).
+    """
+    started = time.time()
+    record = {
+        "name": Path(path).name,
+        "status": "failed",
+        "moonlabel": None,
+        "fullness": np.nan,
+        "error": None,
+    }
+    if keep_masks:
+        record["moonmask"] = None
+    with profiling() if profile else nullcontext() as profiler:
+        set_frame(record["name"])
+        try:
+            # only the numbers come back from the worker, so don't draw
+            params = {"draw_circle": False} | params
+            with stage_timer("load"):
+                image = load_goes_image(path)
+            with stage_timer("fullness_algorithm"):
+                result = fullness_algorithm(image, **params)
+            record["status"] = result["status"]
+            record["moonlabel"] = result["moonlabel"]
+            record["fullness"] = result.get("fullness", np.nan)
+            if result["status"] != "ok":
+                record["error"] = result["status"]
+            if keep_masks and "moonmask" in result:
+                record["moonmask"] = rle_encode(result["moonmask"])
+        except Exception as ex:
+            record["error"] = f"{type(ex).__name__}: {ex}"
+    if profile:
+        record["stages"] = profiler.records
+    record["worker"] = os.getpid()
+    record["started"], record["stopped"] = started, time.time()
+    return record
+
+
+def _failed_record(path, ex):
+    return {
+        "name": Path(path).name,
+        "status": "failed",
+        "moonlabel": None,
+        "fullness": np.nan,
+        "error": f"{type(ex).__name__}: {ex}",
+    }
+
+
+def iter_fullness_batch(
+    paths,
+    params,
+    n_workers=None,
+    max_pending=None,
+    keep_masks=False,
+    profile=False,
+):
+    """
+    Run process_file() on every path in `paths` in a pool of `n_workers`
+    processes (by default, one per CPU), yielding result dicts in the
+    order they finish. At most `max_pending` files (by default 4 per
+    worker) are queued at once, so this works on arbitrarily large
+    archives.
+
+    If a worker process dies (e.g. it's killed for running out of
+    memory), the pool can't be used any more: every file that was queued
+    in it is recorded as failed, and the rest of `paths` goes to a fresh
+    pool.
+    """
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    max_pending = 4 * n_workers if max_pending is None else max_pending
+    paths = iter(paths)
+    while True:
+        pending, broken = {}, False
+        with ProcessPoolExecutor(n_workers) as pool:
+            while not broken:
+                for path in paths:
+                    try:
+                        future = pool.submit(
+                            process_file, path, params, keep_masks, profile
+                        )
+                    except BrokenProcessPool:
+                        # never ran, so hand it to the next pool
+                        paths, broken = chain([path], paths), True
+                        break
+                    pending[future] = path
+                    if len(pending) >= max_pending:
+                        break
+                if len(pending) == 0:
+                    if broken:
+                        break
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        yield future.result()
+                    except Exception as ex:
+                        # the worker itself died (e.g. out of memory)
+                        broken |= isinstance(ex, BrokenProcessPool)
+                        yield _failed_record(path, ex)
+            # whatever was queued in a broken pool is lost with it
+            for future, path in pending.items():
+                yield _failed_record(
+                    path, BrokenProcessPool("a worker process died")
+                )
+
+
+def worker_report(results, wall_time):
+    """
+    Per-worker summary of a batch run: images processed, busy seconds,
+    and utilisation (busy time as a fraction of the run's wall time).
+    """
+    if "worker" not in results:
+        # every worker died before returning anything
+        report = pd.DataFrame(columns=["images", "busy_s", "utilisation"])
+        return report.rename_axis("worker")
+    timed = results.dropna(subset=["worker"])
+    busy = timed["stopped"] - timed["started"]
+    report = busy.groupby(timed["worker"]).agg(["count", "sum"])
+    report.columns = ["images", "busy_s"]
+    report["utilisation"] = report["busy_s"] / wall_time
+    return report
+
+
+def run_fullness_batch(
+    lun_index,
+    lun_folder,
+    params,
+    n_workers=None,
+    max_pending=None,
+    keep_masks=False,
+    profile=False,
+):
+    """
+    Run the fullness pipeline on every file named in the 'name' column of
+    `lun_index` (a DataFrame like indices/lun_index.csv), looking for the
+    files in `lun_folder`. Each distinct name is processed once. `params`
+    are the keyword arguments for fullness_algorithm(): threshold,
+    erosion_size, min_width, min_height, edge_size, dilation_size,
+    cutout_margin.
+
+    Returns a tuple of:
+        * a DataFrame of results, one row per file, with 'name', 'status',
+          'moonlabel', 'fullness', and 'error' columns (plus timing
+          columns, and run-length encoded Moon masks in 'moonmask' if
+          `keep_masks` is True), merged with the other columns of
+          `lun_index`
+        * a dict with overall throughput and a per-worker report, plus,
+          if `profile` is True, every worker's per-stage timing and
+          memory records in 'stages' (see ktsutils.profiling)
+    """
+    lun_folder = Path(lun_folder)
+    began = time.time()
+    records = list(
+        iter_fullness_batch(
+            (lun_folder / name for name in lun_index["name"].unique()),
+            params,
+            n_workers,
+            max_pending,
+            keep_masks,
+            profile,
+        )
+    )
+    wall_time = time.time() - began
+    stages = [
+        stage for record in records for stage in record.pop("stages", ())
+    ]
+    results = pd.DataFrame(records)
+    results = lun_index.merge(
+        results, on="name", how="left", validate="many_to_one"
+    )
+    stats = {
+        "images": len(results),
+        "wall_s": wall_time,
+        "images_per_s": len(results) / wall_time,
+        "workers": worker_report(results, wall_time),
+    }
+    if profile:
+        stats["stages"] = stage_records(stages)
+    return results, stats
@@ -0,0 +1,149 @@
+"""
+Declared schemas for loading star catalogs into compact pandas DataFrames.
+
+A schema is just a dict mapping column names to a spec dict. Spec keys:
+    * "dtype": the pandas dtype the column should end up with
+    * "normalize" (optional): "strip" (remove surrounding whitespace) or
+      "squeeze" (also collapse runs of internal whitespace to one space).
+      Strings that are empty after normalization become missing.
+    * "sexagesimal" (optional): "hour" or "deg". If the column contains
+      strings, decode them from sexagesimal notation to decimal degrees.
+"""
+from collections.abc import Mapping
+
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from ktsutils.angles import sexagesimal_to_degrees
+
+# Bright Star Catalogue, 5th Revised Ed. (VizieR V/50), as fetched in
+# lesson 2. Coordinates stay float64: they're used for coordinate
+# transformations later, and we don't want to think about whether
+# float32 rounding matters. Magnitudes and colors are only given to two
+# decimal places, so float32 loses nothing.
+BSC_SCHEMA = {
+    "HR": {"dtype": "Int16"},
+    "Name": {"dtype": "string", "normalize": "squeeze"},
+    "HD": {"dtype": "Int32"},
+    "ADS": {"dtype": "Int32"},
+    "VarID": {"dtype": "category", "normalize": "squeeze"},
+    "RAJ2000": {"dtype": "float64", "sexagesimal": "hour"},
+    "DEJ2000": {"dtype": "float64", "sexagesimal": "deg"},
+    "Vmag": {"dtype": "float32"},
+    "B-V": {"dtype": "float32"},
+    "SpType": {"dtype": "category", "normalize": "strip"},
+    "NoteFlag": {"dtype": "category", "normalize": "strip"},
+}
+
+_STRINGLIKE = ("string", "category", "object")
+
+
+def _normalize(series, how):
+    series = series.astype("string")
+    if how == "squeeze":
+        series = series.str.replace(r"\s+", " ", regex=True)
+    elif how != "strip":
+        raise ValueError("normalize can be 'strip' or 'squeeze'.")
+    series = series.str.strip()
+    return series.mask(series == "")
+
+
+def apply_column_spec(series, spec):
+    """Return a copy of `series` converted according to a schema spec."""
+    if spec.get("sexagesimal") is not None and not is_numeric_dtype(series):
+        strings = series.astype(object).where(series.notna(), None)
+        series = pd.Series(
+            sexagesimal_to_degrees(strings.to_numpy(), spec["sexagesimal"]),
+            index=series.index,
+            name=series.name,
+        )
+    if spec.get("normalize") is not None:
+        series = _normalize(series, spec["normalize"])
+    if str(spec["dtype"])[:1] in ("I", "U") and not is_numeric_dtype(series):
+        # nullable integer columns that came in as strings (e.g. ADS,
+        # which VizieR gives as str5)
+        series = pd.to_numeric(series.astype("string").str.strip().mask(
+            lambda s: s == ""
+        ))
+    return series.astype(spec["dtype"])
+
+
+def apply_schema(df, schema=BSC_SCHEMA):
+    """
+    Return a copy of `df` with every column named in `schema` converted to
+    its declared dtype. Columns not named in `schema` are left alone;
+    columns named in `schema` but missing from `df` are ignored.
+    """
+    df = df.copy()
+    for column, spec in schema.items():
+        if column in df.columns:
+            df[column] = apply_column_spec(df[column], spec)
+    return df
+
+
+def read_catalog(path, schema=BSC_SCHEMA, **read_csv_kwargs):
+    """
+    Read a catalog CSV file, like the 'catalog.csv' or 'bsc_clean.csv' files
+    written in lesson 2, and apply `schema` to it. Extra keyword arguments
+    are passed to `pd.read_csv()`.
+
+    String-like columns are read as strings and float32 columns are
+    parsed straight to float32. Coordinate columns may be either
+    sexagesimal strings (as in 'catalog.csv') or decimal degrees (as in
+    'bsc_clean.csv'). A `dtype` dict overrides these per column; any other
+    `dtype` (like `str`) replaces them for every column.
+    """
+    dtypes = {}
+    for column, spec in schema.items():
+        if "sexagesimal" in spec:
+            # let pandas decide: these are strings in a raw catalog but
+            # numbers in a cleaned one
+            continue
+        if str(spec["dtype"]) in _STRINGLIKE:
+            dtypes[column] = "object"
+        elif str(spec["dtype"]) == "float32":
+            dtypes[column] = "float32"
+    dtype = read_csv_kwargs.pop("dtype", {})
+    if isinstance(dtype, Mapping):
+        dtypes |= dtype
+    else:
+        dtypes = dtype
+    df = pd.read_csv(
+        path, dtype=dtypes, keep_default_na=False, na_values=[""],
+        **read_csv_kwargs
+    )
+    return apply_schema(df, schema)
+
+
+def memory_report(before, after):
+    """
+    Compare the per-column memory usage, in bytes, of two versions of a
+    DataFrame (e.g. one loaded with pandas defaults and one with a schema
+    applied). The last row gives totals.
+    """
+    report = pd.DataFrame(
+        {
+            "dtype_before": before.dtypes.astype(str),
+            "dtype_after": after.dtypes.reindex(before.columns).astype(str),
+            "bytes_before": before.memory_usage(deep=True, index=False),
+            "bytes_after": after.memory_usage(deep=True, index=False).reindex(
+                before.columns
+            ),
+        }
+    )
+    report.loc["total"] = [
+        "", "", report["bytes_before"].sum(), report["bytes_after"].sum()
+    ]
+    report["ratio"] = report["bytes_after"] / report["bytes_before"]
+    return report
+
+
+def catalog_memory_report(path, schema=BSC_SCHEMA, **read_csv_kwargs):
+    """
+    Load the catalog at `path` twice -- once with pandas defaults and once
+    with `schema` -- and return `memory_report()` for the pair.
+    """
+    return memory_report(
+        pd.read_csv(path, **read_csv_kwargs),
+        read_catalog(path, schema, **read_csv_kwargs)
+    )
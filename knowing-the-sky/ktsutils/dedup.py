@@ -0,0 +1,192 @@
+"""
+Skipping near-duplicate frames. The LUN archive often contains runs of
+frames of the same scene taken a minute or so apart, which give the same
+fullness. dedup_fullness() reduces each frame to a small signature (its
+block-averaged radiance), walks through the frames in time order, and
+starts a new cluster whenever a frame's signature differs from the
+current cluster's first frame (its representative) by more than a
+tolerance. Only representatives go through the fullness pipeline; the
+other members of each cluster get their representative's results.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from ktsutils.fullness import fullness_algorithm, load_goes_image
+from ktsutils.goes import frame_paths
+from ktsutils.stream import read_ahead
+
+
+def frame_signature(image, size=16):
+    """
+    Downsample `image` to a `size` x `size` grid of block means. Rows and
+    columns that don't fill a whole block are dropped.
+    """
+    block_y, block_x = image.shape[0] // size, image.shape[1] // size
+    if block_y == 0 or block_x == 0:
+        raise ValueError(f"{image.shape} image is smaller than {size}x{size}")
+    blocks = image[:block_y * size, :block_x * size].reshape(
+        size, block_y, size, block_x
+    )
+    return blocks.mean(axis=(1, 3), dtype=np.float64)
+
+
+def signature_distance(signature, reference):
+    """
+    Mean absolute difference between two signatures, relative to the mean
+    absolute value of `reference`.
+    """
+    scale = np.abs(reference).mean()
+    if scale == 0:
+        return 0.0 if not np.any(signature) else np.inf
+    return np.abs(signature - reference).mean() / scale
+
+
+RESULT_COLUMNS = [
+    "name",
+    "cluster",
+    "representative",
+    "distance",
+    "status",
+    "moonlabel",
+    "fullness",
+    "error",
+]
+
+
+def _measure(image, params):
+    """
+    Run fullness_algorithm() on one frame, following the conventions of
+    ktsutils.batch.process_file(): never raises, and 'error' is None, the
+    status, or the exception.
+    """
+    try:
+        result = fullness_algorithm(image, **params, draw_circle=False)
+    except Exception as ex:
+        return {
+            "status": "failed",
+            "moonlabel": None,
+            "fullness": np.nan,
+            "error": f"{type(ex).__name__}: {ex}",
+        }
+    return {
+        "status": result["status"],
+        "moonlabel": result["moonlabel"],
+        "fullness": result.get("fullness", np.nan),
+        "error": None if result["status"] == "ok" else result["status"],
+    }
+
+
+def dedup_fullness(
+    index,
+    lun_folder,
+    params,
+    tolerance=0.02,
+    size=16,
+    validate=False,
+    loader=load_goes_image,
+    max_in_flight=4,
+):
+    """
+    Run fullness_algorithm() (with keyword arguments `params`) on the
+    frames of a frame index (from ktsutils.goes), processing only one
+    representative of each cluster of near-identical consecutive frames.
+    Frames are only clustered with frames of the same satellite and
+    channel. With `validate=True`, every frame is processed anyway, so
+    that the report can say how much results vary within clusters
+    (useful for choosing `tolerance`). Files are loaded with `loader` in
+    a background thread (see ktsutils.stream.read_ahead()), so a custom
+    loader that reads NetCDF files must hold
+    ktsutils.fullness.NETCDF_LOCK while it does, like load_goes_image().
+
+    Returns a tuple of:
+        * a DataFrame with one row per frame: 'name', 'cluster',
+          'representative' (bool), 'distance' (signature distance from
+          its representative), 'status', 'moonlabel', 'fullness', 'error'
+          (the cluster's results), plus, if validating, 'own_status' and
+          'own_fullness' (the frame's own results)
+        * a dict reporting how many frames were processed, the fraction
+          of pipeline runs skipped, pipeline seconds spent, and a
+          per-cluster DataFrame ('clusters') with each cluster's size
+          and, if validating, its maximum fullness difference (NaN if any
+          member has no fullness of its own) and the number of members
+          whose own status differs from their representative's
+    """
+    order = [c for c in ("satellite", "channel", "utc") if c in index]
+    frames = index.sort_values(order) if order else index
+    keys = [None] * len(frames)
+    if {"satellite", "channel"} <= set(frames.columns):
+        keys = list(
+            zip(
+                frames["satellite"].astype(object),
+                frames["channel"].astype(object),
+            )
+        )
+    stream = read_ahead(
+        frame_paths(lun_folder, frames),
+        loader=loader,
+        max_in_flight=max_in_flight,
+    )
+    records, pipeline_seconds = [], 0.0
+    cluster, key, signature, summary = -1, object(), None, None
+    for frame, frame_key in zip(stream, keys):
+        record = {"name": frame["name"], "error": frame.get("error")}
+        if record["error"] is not None:
+            records.append(record | {"status": "failed"})
+            continue
+        image = frame.pop("image")
+        try:
+            this_signature = frame_signature(image, size)
+        except ValueError as ex:
+            records.append(record | {"status": "failed", "error": str(ex)})
+            continue
+        distance = np.inf
+        if frame_key == key:
+            distance = signature_distance(this_signature, signature)
+        representative = distance > tolerance
+        if representative:
+            cluster, key, signature = cluster + 1, frame_key, this_signature
+            distance = 0.0
+        record |= {
+            "cluster": cluster,
+            "representative": representative,
+            "distance": distance,
+        }
+        if representative or validate:
+            began = time.perf_counter()
+            own = _measure(image, params)
+            pipeline_seconds += time.perf_counter() - began
+            if representative:
+                summary = own
+            if validate:
+                record["own_status"] = own["status"]
+                record["own_fullness"] = own["fullness"]
+        records.append(record | summary)
+    columns = RESULT_COLUMNS
+    if validate:
+        columns = columns + ["own_status", "own_fullness"]
+    results = pd.DataFrame(records, columns=columns)
+    clustered = results.dropna(subset=["cluster"])
+    clusters = clustered.groupby("cluster")
+    cluster_report = clusters.agg(size=("name", "count"))
+    if validate:
+        cluster_report["max_fullness_diff"] = clusters["own_fullness"].agg(
+            lambda f: f.max(skipna=False) - f.min(skipna=False)
+        )
+        mismatched = clustered["own_status"] != clustered["status"]
+        cluster_report["status_mismatches"] = mismatched.groupby(
+            clustered["cluster"]
+        ).sum()
+    processed = int(results["representative"].fillna(False).sum())
+    clustered = len(clustered)
+    report = {
+        "frames": len(results),
+        "processed": processed,
+        "skipped_fraction": (
+            1 - processed / clustered if clustered else 0.0
+        ),
+        "pipeline_s": pipeline_seconds,
+        "clusters": cluster_report,
+    }
+    return results, report
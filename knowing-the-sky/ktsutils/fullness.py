@@ -0,0 +1,273 @@
+"""
+The lunar fullness pipeline developed step by step in
+morphology_snippet.ipynb, collected in one place so that it can be run
+over whole archives of GOES LUN images.
+"""
+import threading
+
+from netCDF4 import Dataset
+import numpy as np
+import scipy.ndimage as ndi
+
+from ktsutils.labels import label_index, label_pixels
+from ktsutils.morphology import box_dilation, box_erosion
+from ktsutils.opencv import draw_shape, shape_canvas, shape_params
+from ktsutils.profiling import stage_timer
+
+
+# netCDF4 (and the HDF5 library under it) isn't thread-safe, so only one
+# thread at a time may open or read a file; hold this lock while you do
+NETCDF_LOCK = threading.Lock()
+
+
+def load_goes_image(path):
+    with NETCDF_LOCK, Dataset(path) as nc:
+        array = nc.variables['radiance'][:]
+    return array.filled(0)
+
+
+def make_outline(image, threshold):
+    return image > threshold
+
+
+def erode(image, erosion_size):
+    if erosion_size is None:
+        return image
+    return box_erosion(image, erosion_size)
+
+
+def dilate(image, dilation_size):
+    if dilation_size is None:
+        return image
+    return box_dilation(image, dilation_size)
+
+
+def indexed_label(arr):
+    """
+    Label `arr` and find the x/y coordinates of every label (including
+    0, the background). Returns the label array and a dict like
+    {label: {'y': y_indices, 'x': x_indices}}.
+
+    Uses label_index() to do this in a fixed number of passes over the
+    image, rather than one pass per label.
+    """
+    labels, n_labels = ndi.label(arr)
+    index = label_index(labels, n_labels)
+    y_indices, x_indices = np.nonzero(labels == 0)
+    label_indices = {0: {'y': y_indices, 'x': x_indices}}
+    for l in range(1, n_labels + 1):
+        label_indices[l] = label_pixels(index, l)
+    return labels, label_indices
+
+
+def filter_label_size(indices, min_width, min_height):
+    exclusions = []
+    # np.ptp(arr) is shorthand for arr.max() - arr.min()
+    if min_width is not None and np.ptp(indices['x']) < min_width:
+        exclusions.append('width')
+    if min_height is not None and np.ptp(indices['y']) < min_height:
+        exclusions.append('height')
+    return exclusions
+
+
+def filter_label_edge(indices, array_shape, edge_size):
+    if edge_size is None:
+        return []
+    exclusions = []
+    if (indices['x'] <= edge_size).any():
+        exclusions.append('left')
+    if (array_shape[1] - indices['x'] <= edge_size).any():
+        exclusions.append('right')
+    if (indices['y'] <= edge_size).any():
+        exclusions.append('top')
+    if (array_shape[0] - indices['y'] <= edge_size).any():
+        exclusions.append('bottom')
+    return exclusions
+
+
+def check_labels(
+    label_indices, array_shape, min_width, min_height, edge_size
+):
+    """
+    Handler function that runs filter_label_size() and filter_label_edge()
+    on a collection of label indices.
+    Returns a dict of lists giving the exclusions each label hit. If
+    a label passed all the tests, its list will be empty.
+    """
+    label_statuses = {}
+    for label, indices in label_indices.items():
+        label_statuses[label] = (
+            filter_label_size(indices, min_width, min_height)
+            + filter_label_edge(indices, array_shape, edge_size)
+        )
+    return label_statuses
+
+
+# the order check_labels() reports exclusions in
+EXCLUSIONS = ('width', 'height', 'left', 'right', 'top', 'bottom')
+
+
+def check_label_boxes(index, array_shape, min_width, min_height, edge_size):
+    """
+    Vectorized equivalent of check_labels(). Every size and edge rule
+    depends only on a label's extreme x/y coordinates, so they can all be
+    evaluated at once from the bounding boxes in `index` (as returned by
+    ktsutils.labels.label_index()). Returns the same dict of exclusion
+    lists as check_labels().
+    """
+    min_x, max_x = index['min_x'], index['max_x']
+    min_y, max_y = index['min_y'], index['max_y']
+    hits = {}
+    if min_width is not None:
+        hits['width'] = max_x - min_x < min_width
+    if min_height is not None:
+        hits['height'] = max_y - min_y < min_height
+    if edge_size is not None:
+        hits['left'] = min_x <= edge_size
+        hits['right'] = array_shape[1] - max_x <= edge_size
+        hits['top'] = min_y <= edge_size
+        hits['bottom'] = array_shape[0] - max_y <= edge_size
+    # pack each label's results into a bitmask so that we only have to
+    # build one exclusion list per distinct combination
+    codes = np.zeros(len(min_x), dtype=np.int64)
+    for bit, name in enumerate(EXCLUSIONS):
+        if name in hits:
+            codes |= hits[name].astype(np.int64) << bit
+    present = np.flatnonzero(index['area'] > 0)
+    lists = {
+        code: [name for bit, name in enumerate(EXCLUSIONS) if code >> bit & 1]
+        for code in np.unique(codes[present]).tolist()
+    }
+    return {
+        label: list(lists[code])
+        for label, code in zip(present.tolist(), codes[present].tolist())
+    }
+
+
+def filter_labels(label_statuses):
+    """encapsulates the rule that we must have exactly one Moon in an image."""
+    ok_labels = [
+        i for i, exclusions in label_statuses.items() if exclusions == []
+    ]
+    if len(ok_labels) == 0:
+        return "no Moon", None
+    elif len(ok_labels) > 1:
+        return "ambiguous Moon", None
+    return "ok", ok_labels[0]
+
+
+def moon_pixels(index, moonlabel):
+    """
+    y/x coordinates of the Moon label's pixels, given an index from
+    `label_index()`. With no edge rules, the background itself (label 0)
+    can pass the checks, and label_index() doesn't record its pixels, so
+    those are everything no other label covers.
+    """
+    if moonlabel != 0:
+        return label_pixels(index, moonlabel)
+    background = np.ones(index["shape"], dtype=bool)
+    background.flat[index["pixels"]] = False
+    y_indices, x_indices = np.nonzero(background)
+    return {'y': y_indices, 'x': x_indices}
+
+
+def cut_around_indices(image, indices, cutout_margin):
+    """
+    `indices` should be a single value from the `label_indices` dict
+    returned by `indexed_label()` specifying the x/y coordinates occupied
+    by a specific label.
+    """
+    min_x = max(indices['x'].min() - cutout_margin, 0)
+    max_x = min(indices['x'].max() + cutout_margin, image.shape[1])
+    min_y = max(indices['y'].min() - cutout_margin, 0)
+    max_y = min(indices['y'].max() + cutout_margin, image.shape[0])
+    cutout = image[min_y:max_y, min_x:max_x]
+    # indices of label relative to the cutout
+    cutout_indices = {'x': indices['x'] - min_x, 'y': indices['y'] - min_y}
+    return cutout, cutout_indices
+
+
+def make_mask_and_cutout(
+    image, moonlabel_indices, dilation_size, cutout_margin
+):
+    # A cutout from the original image and the indices
+    # of the label within that cutout relative to the
+    # boundaries of the cutout.
+    cutout, cut_indices = cut_around_indices(
+        image, moonlabel_indices, cutout_margin
+    )
+    # A boolean array of the same dimensions as the cutout
+    moonmask = np.full(cutout.shape, False)
+    # set moonmask to True where the Moon label is present,
+    # False elsewhere.
+    moonmask[cut_indices['y'], cut_indices['x']] = True
+    return cutout, dilate(moonmask, dilation_size)
+
+
+def compare_to_circle(mask, draw=True):
+    """
+    Draw a bounding circle around a mask made from a label.
+    Compare the area of the mask to the area of that circle.
+    Return the computed area ratio, and a representation of
+    that circle drawn on the mask (or None if `draw` is False, which
+    skips allocating and drawing the image entirely).
+    """
+    umask = mask.astype("u1")
+    mask_area = umask.sum()
+    params = shape_params(umask, "circle")
+    circle = None
+    if draw is True:
+        circle = draw_shape(shape_canvas(umask, True), "circle", params)
+    return mask_area / (np.pi * params['r'] ** 2), circle
+
+
+def fullness_algorithm(
+    image,
+    threshold,
+    erosion_size,
+    min_width,
+    min_height,
+    edge_size,
+    dilation_size,
+    cutout_margin,
+    return_labels=False,
+    draw_circle=True
+):
+    with stage_timer("outline"):
+        outline = make_outline(image, threshold)
+    with stage_timer("erode"):
+        eroded = erode(outline, erosion_size)
+    with stage_timer("label"):
+        labels, n_labels = ndi.label(eroded)
+        index = label_index(labels, n_labels)
+    with stage_timer("check_labels"):
+        label_statuses = check_label_boxes(
+            index, image.shape, min_width, min_height, edge_size
+        )
+        # 'status' is the overall status of the algorithm.
+        # 'moonlabel' is the number of the label the algorithm identified
+        # as corresponding to the Moon, or None if it didn't find the Moon.
+        status, moonlabel = filter_labels(label_statuses)
+    output = {
+        "status": status,
+        "moonlabel": moonlabel,
+        "label_statuses": label_statuses,
+    }
+    # these will use up a lot of memory.
+    if return_labels is True:
+        output["labels"] = labels
+    # We can't continue if we can't identify the Moon.
+    if status != "ok":
+        return output
+    with stage_timer("mask_and_cutout"):
+        cutout, moonmask = make_mask_and_cutout(
+            image, moon_pixels(index, moonlabel), dilation_size, cutout_margin
+        )
+    with stage_timer("compare_to_circle"):
+        fullness, circle = compare_to_circle(moonmask, draw_circle)
+    return output | {
+        'moonmask': moonmask,
+        'cutout': cutout,
+        'circle': circle,
+        'fullness': fullness
+    }
@@ -0,0 +1,277 @@
+"""
+Indexing archives of GOES ABI NetCDF files (like the LUN files used in
+lesson 6) without loading any image data.
+
+GOES filenames carry most of what we need, e.g.:
+
+    OR_ABI-INST-CAL-LUN-M3C01_G17_s20190232339569_e20190232339569_c20190232340140-t0-s1.nc
+
+is a mode 3, channel 1 image from GOES-17 whose observation started at
+2019, day of year 023, 23:39:56.9 UTC. For the full-precision start time,
+build_file_index() can instead read the `time_coverage_start` global
+attribute, which only requires the file's header. Either way, the index
+is saved to disk along with each file's size and modification time, so
+that updating it only has to look at new or changed files.
+"""
+from concurrent.futures import ProcessPoolExecutor
+import os
+from pathlib import Path
+
+from netCDF4 import Dataset
+import numpy as np
+import pandas as pd
+
+# bump this when the index's columns change, so old indexes get rebuilt
+INDEX_VERSION = 2
+
+GOES_FILENAME_PATTERN = (
+    r"OR_ABI-(?P<product>[A-Za-z0-9-]+?)-M(?P<mode>\d+)C(?P<channel>\d+)"
+    r"_G(?P<satellite>\d+)_s(?P<start>\d{14})_e(?P<end>\d{14})"
+    r"_c(?P<created>\d{14})(?P<suffix>[^.]*)\.nc$"
+)
+
+
+def goes_timestamps(codes):
+    """
+    Convert GOES filename time codes (YYYYDDDHHMMSSt: year, day of year,
+    hour, minute, second, tenths of a second) to UTC datetimes.
+    """
+    codes = pd.Series(codes, dtype="string")
+    whole = pd.to_datetime(codes.str[:13], format="%Y%j%H%M%S", utc=True)
+    tenths = pd.to_timedelta(codes.str[13].astype("Int64") * 100, unit="ms")
+    return whole + tenths
+
+
+# filename fields stored as categoricals, in the form they take in the
+# filename: 'G17', 'M3', 'C01', 't0-s1'...
+CATEGORICAL_FIELDS = ("product", "satellite", "mode", "channel", "suffix")
+# time fields, all stored with the same resolution so indexes read back
+# from Parquet and freshly parsed ones concatenate cleanly
+TIME_FIELDS = ("utc", "end", "created")
+TIME_DTYPE = "datetime64[ns, UTC]"
+
+
+def parse_goes_filenames(names):
+    """
+    Parse a sequence of GOES filenames. Returns a DataFrame with columns:
+        * 'name': the filename
+        * 'utc', 'end', 'created': observation start and end times, and
+          file creation time
+        * 'product', 'satellite', 'mode', 'channel', 'suffix':
+          categoricals like 'INST-CAL-LUN', 'G17', 'M3', 'C01', 't0-s1'
+    Fields of names that don't look like GOES filenames are null.
+    """
+    names = pd.Series(list(names), dtype="string")
+    fields = names.str.extract(GOES_FILENAME_PATTERN)
+    index = pd.DataFrame(
+        {
+            "name": names.astype(object),
+            "utc": goes_timestamps(fields["start"]),
+            "end": goes_timestamps(fields["end"]),
+            "created": goes_timestamps(fields["created"]),
+            "product": fields["product"],
+            "satellite": "G" + fields["satellite"],
+            "mode": "M" + fields["mode"],
+            "channel": "C" + fields["channel"],
+            "suffix": fields["suffix"].str.lstrip("-"),
+        }
+    )
+    return categorize(index)
+
+
+def categorize(index):
+    """Store the filename fields of a frame index as categoricals."""
+    for field in CATEGORICAL_FIELDS:
+        index[field] = index[field].astype("string").astype("category")
+    return index
+
+
+def read_start_times(paths):
+    """
+    Read the `time_coverage_start` global attribute of each of `paths`,
+    closing every file behind it. Files that can't be read get None.
+    """
+    times = []
+    for path in paths:
+        try:
+            with Dataset(path) as nc:
+                times.append(nc.getncattr("time_coverage_start"))
+        except (OSError, AttributeError):
+            times.append(None)
+    return times
+
+
+def scan_folder(folder, suffix=".nc"):
+    """Name, size and modification time of every `suffix` file in `folder`."""
+    records = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(suffix):
+                stat = entry.stat()
+                records.append(
+                    {
+                        "name": entry.name,
+                        "size": stat.st_size,
+                        "mtime": stat.st_mtime_ns,
+                    }
+                )
+    return pd.DataFrame(records, columns=["name", "size", "mtime"])
+
+
+def _chunks(items, n_chunks):
+    size = max(1, -(-len(items) // n_chunks))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def index_files(folder, files, read_headers=True, n_workers=None):
+    """
+    Build index rows for `files` (a DataFrame from scan_folder()). If
+    `read_headers` is True, 'utc' comes from each file's
+    `time_coverage_start` attribute, read in a pool of `n_workers`
+    processes; otherwise it comes from the filename.
+    """
+    index = parse_goes_filenames(files["name"])
+    index["size"] = files["size"].to_numpy()
+    index["mtime"] = files["mtime"].to_numpy()
+    if not read_headers or len(files) == 0:
+        return index
+    paths = [str(Path(folder, name)) for name in files["name"]]
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    # several chunks per worker, so slow disks don't leave workers idle
+    with ProcessPoolExecutor(n_workers) as pool:
+        chunks = pool.map(read_start_times, _chunks(paths, 4 * n_workers))
+        starts = [start for chunk in chunks for start in chunk]
+    header_utc = pd.to_datetime(pd.Series(starts), utc=True, format="ISO8601")
+    # fall back to the filename for files without a readable header
+    index["utc"] = header_utc.fillna(index["utc"])
+    return index
+
+
+def build_file_index(
+    folder, index_path=None, read_headers=True, n_workers=None
+):
+    """
+    Index every NetCDF file in `folder`. Returns a DataFrame with the
+    columns described in parse_goes_filenames(), plus 'size' and 'mtime',
+    sorted by 'utc'.
+
+    If `index_path` is given, the index is saved there as Parquet, and an
+    existing index at that path is reused for files whose size and
+    modification time haven't changed. Files that have disappeared from
+    `folder` are dropped.
+    """
+    files = scan_folder(folder)
+    old = None
+    if index_path is not None and Path(index_path).exists():
+        old = pd.read_parquet(index_path)
+        if old.attrs.get("version") != INDEX_VERSION or (
+            old.attrs.get("read_headers") != read_headers
+        ):
+            old = None
+    if old is not None:
+        merged = files.merge(
+            old[["name", "size", "mtime"]], how="left", indicator=True
+        )
+        unchanged = (merged["_merge"] == "both").to_numpy()
+        kept = old.loc[old["name"].isin(files.loc[unchanged, "name"])]
+        fresh = index_files(
+            folder, files.loc[~unchanged], read_headers, n_workers
+        )
+        parts = [part for part in (kept, fresh) if len(part)]
+        index = pd.concat(parts) if parts else fresh
+    else:
+        index = index_files(folder, files, read_headers, n_workers)
+    index = categorize(index)
+    for field in TIME_FIELDS:
+        index[field] = index[field].astype(TIME_DTYPE)
+    index = index.sort_values(["utc", "name"]).reset_index(drop=True)
+    if index_path is not None:
+        index.attrs |= {"version": INDEX_VERSION, "read_headers": read_headers}
+        index.to_parquet(index_path, index=False)
+    return index
+
+
+def _as_utc(times):
+    """tz-aware UTC version of a datetime-like scalar or sequence."""
+    if np.ndim(times) == 0:
+        times = pd.Timestamp(times)
+    else:
+        times = pd.DatetimeIndex(times)
+    if times.tz is None:
+        return times.tz_localize("UTC")
+    return times.tz_convert("UTC")
+
+
+def near_times(utc, times, window):
+    """
+    Boolean array: is each of `utc` within +/- `window` (a Timedelta or
+    string like '2 days') of any of `times`?
+    """
+    utc = _as_utc(utc)
+    times = np.sort(_as_utc(times).as_unit("ns").asi8)
+    if len(times) == 0:
+        return np.zeros(len(utc), dtype=bool)
+    window = pd.Timedelta(window).value
+    stamps = utc.as_unit("ns").asi8
+    # the nearest of `times` is either just before or just after
+    after = np.clip(np.searchsorted(times, stamps), 0, len(times) - 1)
+    before = np.clip(after - 1, 0, len(times) - 1)
+    distance = np.minimum(
+        np.abs(times[after] - stamps), np.abs(stamps - times[before])
+    )
+    return (distance <= window) & ~utc.isna()
+
+
+def _field_mask(column, values):
+    if values is None:
+        return np.ones(len(column), dtype=bool)
+    if isinstance(values, str):
+        values = [values]
+    return column.isin(values).to_numpy()
+
+
+def query_frames(
+    index,
+    satellite=None,
+    mode=None,
+    channel=None,
+    suffix=None,
+    start=None,
+    stop=None,
+    around=None,
+    window="2 days",
+):
+    """
+    Select rows of a frame index (from build_file_index() or
+    parse_goes_filenames()). `satellite`, `mode`, `channel` and `suffix`
+    can each be a value like 'G17' / 'M3' / 'C03' / 't0-s1' or a list of
+    them. `start` and `stop` bound 'utc'. If `around` is given, only
+    frames within +/- `window` of one of those times are kept, e.g.:
+
+        query_frames(
+            index, satellite='G17', channel='C03',
+            around=full_moons('2019-01-01', '2024-01-01'), window='2 days'
+        )
+
+    (see ktsutils.moonphase.full_moons()).
+
+    Works entirely from the index, so no files are opened.
+    """
+    keep = (
+        _field_mask(index["satellite"], satellite)
+        & _field_mask(index["mode"], mode)
+        & _field_mask(index["channel"], channel)
+        & _field_mask(index["suffix"], suffix)
+    )
+    if start is not None:
+        keep &= (index["utc"] >= _as_utc(start)).to_numpy()
+    if stop is not None:
+        keep &= (index["utc"] < _as_utc(stop)).to_numpy()
+    if around is not None:
+        keep &= near_times(index["utc"], around, window)
+    return index.loc[keep]
+
+
+def frame_paths(folder, frames):
+    """Full paths to the files listed in a frame index."""
+    return [Path(folder, name) for name in frames["name"]]
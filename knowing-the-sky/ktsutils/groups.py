@@ -0,0 +1,192 @@
+"""
+GOES often images the same lunar observation in several ABI channels
+within a few seconds. Rather than searching each of those frames for the
+Moon independently, the functions here group frames into observations
+(same satellite, close together in time), find the Moon once in the best
+channel of each observation, and then only look for it inside that
+region of interest (ROI) in the other channels.
+"""
+import numpy as np
+import pandas as pd
+
+from ktsutils.fullness import load_goes_image
+from ktsutils.goes import frame_paths
+from ktsutils.localize import (
+    background_hits_edge,
+    localized_fullness,
+    pad_box,
+    roi_fullness,
+)
+
+# order in which to try channels when finding the Moon for a whole
+# observation: the visible and near-IR channels at 1 km resolution
+# first, then the 0.5 km red band (bigger frames), then the rest
+CHANNEL_PREFERENCE = (
+    "C03", "C01", "C05", "C02", "C04", "C06",
+    "C07", "C08", "C09", "C10", "C11", "C12", "C13", "C14", "C15", "C16",
+)
+
+
+def group_observations(index, window="10 seconds"):
+    """
+    Assign each frame of a frame index (from ktsutils.goes) to an
+    observation: a run of frames from the same satellite in which each
+    starts within `window` of the one before. Returns a copy of `index`
+    sorted by satellite and time, with an integer 'observation' column.
+    """
+    frames = index.sort_values(["satellite", "utc"]).copy()
+    satellite = frames["satellite"].astype(object)
+    new = (satellite != satellite.shift()) | ~(
+        frames["utc"].diff() <= pd.Timedelta(window)
+    )
+    frames["observation"] = new.cumsum().to_numpy() - 1
+    return frames
+
+
+def scale_box(box, from_shape, to_shape):
+    """
+    Convert an inclusive (min_y, max_y, min_x, max_x) box between frames
+    of different resolutions covering the same field of view.
+    """
+    scale_y = to_shape[0] / from_shape[0]
+    scale_x = to_shape[1] / from_shape[1]
+    min_y, max_y, min_x, max_x = box
+    return (
+        int(np.floor(min_y * scale_y)),
+        min(int(np.ceil((max_y + 1) * scale_y)), to_shape[0]) - 1,
+        int(np.floor(min_x * scale_x)),
+        min(int(np.ceil((max_x + 1) * scale_x)), to_shape[1]) - 1,
+    )
+
+
+def _touches_inside_edge(box, roi, shape):
+    """Does `box` touch an edge of `roi` that isn't an edge of the frame?"""
+    return (
+        (box[0] == roi[0] and roi[0] > 0)
+        or (box[1] == roi[1] and roi[1] < shape[0] - 1)
+        or (box[2] == roi[2] and roi[2] > 0)
+        or (box[3] == roi[3] and roi[3] < shape[1] - 1)
+    )
+
+
+def observation_fullness(
+    frames,
+    params,
+    channel_preference=CHANNEL_PREFERENCE,
+    pad=16,
+    factor=8,
+):
+    """
+    Run the fullness pipeline on every frame of one observation.
+    `frames` is a list of dicts with 'name', 'channel' and 'image'
+    entries; `params` are the keyword arguments for fullness_algorithm().
+
+    Frames are tried in `channel_preference` order with
+    localized_fullness() until one of them finds the Moon. The Moon's box
+    in that reference frame, scaled to each other frame's resolution and
+    grown by `pad` pixels (to allow for small pointing differences
+    between channels), is then the only part of the other frames that
+    gets searched. If the Moon isn't cleanly inside that ROI in some
+    frame, that frame falls back to localized_fullness().
+
+    Returns one record per frame with 'name', 'channel', 'status',
+    'moonlabel', 'fullness', 'source' ('reference', 'shared' or
+    'independent') and 'pixels' (the number of pixels the pipeline
+    thresholded, eroded and labelled).
+    """
+    rank = {channel: i for i, channel in enumerate(channel_preference)}
+    frames = sorted(
+        frames, key=lambda f: rank.get(f["channel"], len(channel_preference))
+    )
+    records, reference = [], None
+    for frame in frames:
+        image = frame["image"]
+        # roi_fullness() relies on the background failing the edge rules
+        if reference is None or params["edge_size"] is None or not (
+            background_hits_edge(
+                image,
+                params["threshold"],
+                params["erosion_size"],
+                params["edge_size"],
+            )
+        ):
+            result = localized_fullness(image, **params, factor=factor)
+            source = "independent"
+            if reference is None and "moon_box" in result:
+                reference = result["moon_box"], image.shape
+                source = "reference"
+        else:
+            moon_box, reference_shape = reference
+            roi = pad_box(
+                scale_box(moon_box, reference_shape, image.shape),
+                pad + (params["erosion_size"] or 0),
+                image.shape,
+            )
+            result, source = roi_fullness(image, roi, **params), "shared"
+            if result["status"] != "ok" or _touches_inside_edge(
+                result["moon_box"], roi, image.shape
+            ):
+                result = localized_fullness(image, **params, factor=factor)
+                source = "independent"
+        roi = result.get("roi")
+        records.append(
+            {
+                "name": frame["name"],
+                "channel": frame["channel"],
+                "status": result["status"],
+                "moonlabel": result["moonlabel"],
+                "fullness": result.get("fullness", np.nan),
+                "source": source,
+                "pixels": 0 if roi is None else (
+                    (roi[1] - roi[0] + 1) * (roi[3] - roi[2] + 1)
+                ),
+            }
+        )
+    return records
+
+
+def run_grouped_fullness(
+    index,
+    lun_folder,
+    params,
+    window="10 seconds",
+    loader=load_goes_image,
+    **observation_kwargs,
+):
+    """
+    Group the frames of a frame index into observations and run
+    observation_fullness() on each one, loading each observation's files
+    from `lun_folder` with `loader`. Returns a DataFrame with one row per
+    frame; see observation_fullness() for its columns, plus
+    'observation'. Frames that fail to load get an 'error' instead.
+    """
+    frames = group_observations(index, window)
+    records = []
+    for observation, group in frames.groupby("observation", sort=False):
+        loaded = []
+        for path, channel in zip(
+            frame_paths(lun_folder, group), group["channel"]
+        ):
+            try:
+                loaded.append(
+                    {
+                        "name": path.name,
+                        "channel": channel,
+                        "image": loader(path),
+                    }
+                )
+            except Exception as ex:
+                records.append(
+                    {
+                        "name": path.name,
+                        "channel": channel,
+                        "status": "failed",
+                        "error": f"{type(ex).__name__}: {ex}",
+                        "observation": observation,
+                    }
+                )
+        for record in observation_fullness(
+            loaded, params, **observation_kwargs
+        ):
+            records.append(record | {"observation": observation})
+    return pd.DataFrame(records)
@@ -0,0 +1,85 @@
+"""
+Single-pass indexing of label images, like the ones produced by
+`scipy.ndimage.label()`.
+
+Looping over labels and calling `np.nonzero(labels == l)` for each one
+scans the whole image once per label, which gets very slow on noisy
+frames with hundreds or thousands of blobs. `label_index()` instead makes
+a fixed number of passes over the image no matter how many labels it has,
+and returns per-label areas, bounding boxes, and centroids as compact
+arrays (element i describes label i), plus the pixel coordinates of every
+label grouped together in one array.
+"""
+import numpy as np
+import scipy.ndimage as ndi
+
+
+def label_index(labels, n_labels=None):
+    """
+    Index a 2-D integer label image. Returns a dict of arrays of length
+    `n_labels` + 1, indexed by label number (0 is the background):
+        * "area": number of pixels
+        * "min_y", "max_y", "min_x", "max_x": inclusive bounding box
+          (-1 for labels with no pixels)
+        * "centroid_y", "centroid_x": mean pixel position
+    and also:
+        * "pixels": flat indices of all non-background pixels, grouped by
+          label and in raster order within each label
+        * "offsets": label l's pixels are pixels[offsets[l]:offsets[l + 1]]
+        * "shape": the shape of `labels`
+
+    Use `label_pixels()` to get y/x coordinates for a specific label.
+    """
+    labels = np.asarray(labels)
+    if n_labels is None:
+        n_labels = int(labels.max(initial=0))
+    flat = labels.ravel()
+    area = np.bincount(flat, minlength=n_labels + 1)
+    ys, xs = np.indices(labels.shape, sparse=True)
+    rows = np.broadcast_to(ys, labels.shape).ravel()
+    columns = np.broadcast_to(xs, labels.shape).ravel()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centroid_y = np.bincount(flat, rows, n_labels + 1) / area
+        centroid_x = np.bincount(flat, columns, n_labels + 1) / area
+    bbox = np.full((n_labels + 1, 4), -1, dtype=np.int64)
+    for i, box in enumerate(ndi.find_objects(labels, n_labels), start=1):
+        if box is not None:
+            y_slice, x_slice = box
+            bbox[i] = (
+                y_slice.start, y_slice.stop - 1, x_slice.start, x_slice.stop - 1
+            )
+    if area[0] > 0:
+        background = labels == 0
+        y_any = np.flatnonzero(background.any(axis=1))
+        x_any = np.flatnonzero(background.any(axis=0))
+        bbox[0] = y_any[0], y_any[-1], x_any[0], x_any[-1]
+    foreground = np.flatnonzero(flat)
+    # stable, so pixels stay in raster order within each label, just like
+    # np.nonzero(labels == l) would give them
+    pixels = foreground[np.argsort(flat[foreground], kind="stable")]
+    offsets = np.concatenate([[0, 0], np.cumsum(area[1:])])
+    return {
+        "area": area,
+        "min_y": bbox[:, 0],
+        "max_y": bbox[:, 1],
+        "min_x": bbox[:, 2],
+        "max_x": bbox[:, 3],
+        "centroid_y": centroid_y,
+        "centroid_x": centroid_x,
+        "pixels": pixels,
+        "offsets": offsets,
+        "shape": labels.shape,
+    }
+
+
+def label_pixels(index, label):
+    """
+    y/x coordinates of the pixels of `label`, given an index from
+    `label_index()`, as a dict like {'y': y_indices, 'x': x_indices}.
+    Not available for the background (label 0).
+    """
+    if label == 0:
+        raise ValueError("label_index() doesn't record background pixels.")
+    flat = index["pixels"][index["offsets"][label]:index["offsets"][label + 1]]
+    y_indices, x_indices = np.unravel_index(flat, index["shape"])
+    return {"y": y_indices, "x": x_indices}
@@ -0,0 +1,236 @@
+"""
+Coarse-to-fine Moon finding. The Moon usually covers a small part of a
+GOES LUN frame, but fullness_algorithm() thresholds, erodes and labels
+the whole frame at full resolution. localized_fullness() first looks for
+candidate Moon regions in a block-reduced copy of the frame, then runs
+the full-resolution pipeline only inside a padded region of interest
+(ROI) around the single candidate. It falls back to the full frame when
+there is more than one candidate, or when the background itself could
+pass as the Moon (e.g. when there are no edge rules).
+
+Block reduction takes the maximum of each block, so a block is above the
+threshold exactly when any pixel in it is, and every full-resolution
+blob lies inside one coarse blob. A coarse blob too small to hold a blob
+of `min_width` x `min_height` pixels can't contain the Moon, so:
+    * no candidates means the full frame has no Moon either;
+    * one candidate means the Moon, if any, is inside its ROI, and the
+      result within the ROI is the same as on the full frame.
+"""
+import numpy as np
+import scipy.ndimage as ndi
+
+from ktsutils.fullness import (
+    check_label_boxes,
+    compare_to_circle,
+    erode,
+    filter_labels,
+    fullness_algorithm,
+    make_mask_and_cutout,
+    make_outline,
+)
+from ktsutils.labels import label_index, label_pixels
+
+
+def block_reduce_max(image, factor):
+    """
+    Maximum of each `factor` x `factor` block of `image`. Edges that
+    aren't a whole block are padded by repeating the last row/column.
+    """
+    pad_y, pad_x = (-image.shape[0] % factor, -image.shape[1] % factor)
+    if pad_y or pad_x:
+        image = np.pad(image, ((0, pad_y), (0, pad_x)), mode="edge")
+    rows, columns = image.shape[0] // factor, image.shape[1] // factor
+    return image.reshape(rows, factor, columns, factor).max(axis=(1, 3))
+
+
+def coarse_candidates(image, threshold, min_width, min_height, factor):
+    """
+    Find blobs in a block-reduced copy of `image` big enough to contain
+    the Moon. Returns a list of their bounding boxes in full-resolution
+    pixels, as (min_y, max_y, min_x, max_x), inclusive.
+    """
+    coarse = make_outline(block_reduce_max(image, factor), threshold)
+    index = label_index(*ndi.label(coarse))
+    # a blob spanning n blocks spans at most (n + 1) * factor - 1 pixels
+    span_y = (index["max_y"] - index["min_y"] + 1) * factor - 1
+    span_x = (index["max_x"] - index["min_x"] + 1) * factor - 1
+    big = index["area"] > 0
+    big[0] = False
+    if min_width is not None:
+        big &= span_x >= min_width
+    if min_height is not None:
+        big &= span_y >= min_height
+    return [
+        (
+            index["min_y"][l] * factor,
+            min((index["max_y"][l] + 1) * factor, image.shape[0]) - 1,
+            index["min_x"][l] * factor,
+            min((index["max_x"][l] + 1) * factor, image.shape[1]) - 1,
+        )
+        for l in np.flatnonzero(big)
+    ]
+
+
+def background_hits_edge(image, threshold, erosion_size, edge_size):
+    """
+    Does the background of the full-frame eroded outline come within
+    `edge_size` pixels of the frame edge (so that it fails the edge
+    rules)? binary_erosion() always clears the frame border, so with
+    erosion this is true; otherwise check for a dark pixel near an edge.
+    """
+    if erosion_size is not None and erosion_size > 1:
+        return True
+    band = edge_size + 1
+    return any(
+        (strip <= threshold).any()
+        for strip in (
+            image[:band], image[-band:], image[:, :band], image[:, -band:]
+        )
+    )
+
+
+def pad_box(box, pad, shape):
+    """Grow an inclusive box by `pad` pixels, clipped to `shape`."""
+    min_y, max_y, min_x, max_x = box
+    return (
+        max(min_y - pad, 0),
+        min(max_y + pad, shape[0] - 1),
+        max(min_x - pad, 0),
+        min(max_x + pad, shape[1] - 1),
+    )
+
+
+def roi_fullness(
+    image,
+    roi,
+    threshold,
+    erosion_size,
+    min_width,
+    min_height,
+    edge_size,
+    dilation_size,
+    cutout_margin,
+):
+    """
+    Run the fullness pipeline on the part of `image` inside `roi`, an
+    inclusive (min_y, max_y, min_x, max_x) box, evaluating the size and
+    edge rules in full-frame coordinates. Only labels inside the ROI are
+    considered, and the background (label 0) is assumed to fail the edge
+    rules. Returns the same output as fullness_algorithm(), plus 'roi'
+    and, if the Moon was found, 'moon_box': the Moon label's bounding box
+    in full-frame coordinates. 'moonlabel' and 'label_statuses' refer to
+    labels of the ROI.
+    """
+    min_y, max_y, min_x, max_x = roi
+    eroded = erode(
+        make_outline(image[min_y:max_y + 1, min_x:max_x + 1], threshold),
+        erosion_size,
+    )
+    index = label_index(*ndi.label(eroded))
+    shifted = index | {
+        "area": np.concatenate([[0], index["area"][1:]]),
+        "min_y": index["min_y"] + min_y,
+        "max_y": index["max_y"] + min_y,
+        "min_x": index["min_x"] + min_x,
+        "max_x": index["max_x"] + min_x,
+    }
+    label_statuses = check_label_boxes(
+        shifted, image.shape, min_width, min_height, edge_size
+    )
+    status, moonlabel = filter_labels(label_statuses)
+    output = {
+        "status": status,
+        "moonlabel": moonlabel,
+        "label_statuses": label_statuses,
+        "roi": tuple(roi),
+    }
+    if status != "ok":
+        return output
+    pixels = label_pixels(index, moonlabel)
+    cutout, moonmask = make_mask_and_cutout(
+        image,
+        {"y": pixels["y"] + min_y, "x": pixels["x"] + min_x},
+        dilation_size,
+        cutout_margin,
+    )
+    fullness, circle = compare_to_circle(moonmask)
+    return output | {
+        'moon_box': tuple(
+            int(shifted[key][moonlabel])
+            for key in ("min_y", "max_y", "min_x", "max_x")
+        ),
+        'moonmask': moonmask,
+        'cutout': cutout,
+        'circle': circle,
+        'fullness': fullness
+    }
+
+
+def localized_fullness(
+    image,
+    threshold,
+    erosion_size,
+    min_width,
+    min_height,
+    edge_size,
+    dilation_size,
+    cutout_margin,
+    factor=8,
+):
+    """
+    Same results as fullness_algorithm(), computed on a region of
+    interest where possible. The output also has:
+        * 'mode': 'coarse' if the coarse pass was enough, 'full' if it
+          fell back to the full frame
+        * 'roi': (min_y, max_y, min_x, max_x) of the region the pipeline
+          ran on
+        * 'moon_box': if the Moon was found, the bounding box of its
+          label, in the same form
+    In 'coarse' mode, 'moonlabel' and 'label_statuses' refer to labels
+    of the ROI, not of the full frame, and leave out the background.
+    """
+    params = {
+        "threshold": threshold,
+        "erosion_size": erosion_size,
+        "min_width": min_width,
+        "min_height": min_height,
+        "edge_size": edge_size,
+        "dilation_size": dilation_size,
+        "cutout_margin": cutout_margin,
+    }
+    candidates = coarse_candidates(
+        image, threshold, min_width, min_height, factor
+    )
+    # if the background could pass as the Moon (say, with no edge rules)
+    # only the full frame will do, because it extends outside any ROI
+    if (
+        len(candidates) > 1
+        or edge_size is None
+        or not background_hits_edge(image, threshold, erosion_size, edge_size)
+    ):
+        output = fullness_algorithm(image, **params, return_labels=True)
+        labels = output.pop("labels")
+        output |= {
+            "mode": "full",
+            "roi": (0, image.shape[0] - 1, 0, image.shape[1] - 1),
+        }
+        moonlabel = output["moonlabel"]
+        if output["status"] == "ok" and moonlabel > 0:
+            y_slice, x_slice = ndi.find_objects(labels, moonlabel)[-1]
+            output["moon_box"] = (
+                y_slice.start, y_slice.stop - 1,
+                x_slice.start, x_slice.stop - 1,
+            )
+        return output
+    if len(candidates) == 0:
+        return {
+            "status": "no Moon",
+            "moonlabel": None,
+            "label_statuses": {},
+            "mode": "coarse",
+            "roi": None,
+        }
+    # pad the candidate's box far enough that erosion inside it sees the
+    # same neighborhood it would on the full frame
+    roi = pad_box(candidates[0], (erosion_size or 0) + 1, image.shape)
+    return roi_fullness(image, roi, **params) | {"mode": "coarse"}
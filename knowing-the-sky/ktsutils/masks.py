@@ -0,0 +1,119 @@
+"""
+Compact representations of boolean masks, for keeping per-image masks
+from a whole archive's worth of pipeline results in memory.
+
+    * PackedMask stores 1 bit per pixel (np.packbits()), so it's 8 times
+      smaller than a bool array and supports fast logical operations
+      directly on the packed bytes.
+    * Run-length encoding (rle_encode() / rle_decode()) stores only the
+      lengths of alternating runs of False and True pixels, in raster
+      order. For compact blobs like a Moon mask, that's a few bytes per
+      row the blob covers, regardless of image size.
+"""
+import numpy as np
+
+
+class PackedMask:
+    """
+    A 2-D boolean mask packed 8 pixels to a byte. Supports &, |, ^ and ~
+    with other PackedMasks of the same shape, count(), and unpack().
+    """
+
+    __slots__ = ("shape", "bits")
+
+    def __init__(self, shape, bits):
+        self.shape = tuple(shape)
+        self.bits = bits
+
+    @classmethod
+    def pack(cls, mask):
+        mask = np.asarray(mask, dtype=bool)
+        return cls(mask.shape, np.packbits(mask, axis=None))
+
+    def unpack(self):
+        size = int(np.prod(self.shape))
+        return np.unpackbits(self.bits, count=size).view(bool).reshape(
+            self.shape
+        )
+
+    def _check(self, other):
+        if not isinstance(other, PackedMask) or other.shape != self.shape:
+            raise ValueError("Can only combine PackedMasks of the same shape.")
+
+    def __and__(self, other):
+        self._check(other)
+        return PackedMask(self.shape, self.bits & other.bits)
+
+    def __or__(self, other):
+        self._check(other)
+        return PackedMask(self.shape, self.bits | other.bits)
+
+    def __xor__(self, other):
+        self._check(other)
+        return PackedMask(self.shape, self.bits ^ other.bits)
+
+    def __invert__(self):
+        bits = ~self.bits
+        # keep the padding bits at the end of the last byte clear
+        padding = -int(np.prod(self.shape)) % 8
+        if padding and len(bits):
+            bits[-1] &= 0xFF << padding & 0xFF
+        return PackedMask(self.shape, bits)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, PackedMask)
+            and other.shape == self.shape
+            and np.array_equal(other.bits, self.bits)
+        )
+
+    def count(self):
+        """Number of True pixels."""
+        if hasattr(np, "bitwise_count"):
+            return int(np.bitwise_count(self.bits).sum())
+        # np.bitwise_count() is new in numpy 2.0
+        return int(np.unpackbits(self.bits).sum())
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def __repr__(self):
+        return f"PackedMask(shape={self.shape}, count={self.count()})"
+
+
+def rle_encode(mask):
+    """
+    Run-length encode a boolean mask in raster order. Returns a dict with
+    the mask's 'shape' and 'counts': the lengths of alternating runs,
+    starting with a (possibly empty) run of False.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    flat = mask.ravel()
+    # positions where the value changes, plus both ends
+    changes = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    edges = np.concatenate([[0], changes, [flat.size]])
+    counts = np.diff(edges)
+    if flat.size and flat[0]:
+        counts = np.concatenate([[0], counts])
+    return {"shape": mask.shape, "counts": counts.astype(np.uint32)}
+
+
+def rle_decode(rle):
+    """Rebuild a boolean mask from the output of rle_encode()."""
+    counts = np.asarray(rle["counts"], dtype=np.int64)
+    values = np.arange(len(counts)) % 2 == 1
+    return np.repeat(values, counts).reshape(rle["shape"])
+
+
+def rle_count(rle):
+    """Number of True pixels in a run-length encoded mask."""
+    return int(np.asarray(rle["counts"][1::2], dtype=np.int64).sum())
+
+
+def rle_to_packed(rle):
+    return PackedMask.pack(rle_decode(rle))
+
+
+def packed_to_rle(packed):
+    return rle_encode(packed.unpack())
@@ -0,0 +1,187 @@
+"""
+Median filtering for large images, like the Viking Orbiter frame that
+lesson 6 cleans up with ndi.median_filter().
+
+    * tiled_median_filter() pads the image once the way scipy's boundary
+      `mode` would, splits it into tiles with a halo of neighboring
+      pixels as wide as the footprint reaches, and filters the tiles on a
+      pool of processes (or threads). Every output pixel's window then
+      lies inside its tile, so the stitched result is identical to
+      ndi.median_filter(image, footprint=footprint, mode=mode).
+    * box_median_filter() is a histogram-style median for box footprints
+      on images with a modest number of distinct values (like 8-bit
+      images). For each distinct value it counts the pixels at or below
+      that value in every window with a summed-area table, so its cost
+      depends on the number of distinct values but not on the footprint
+      size, while ndi.median_filter()'s grows with the footprint's area.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import product
+import os
+
+import numpy as np
+import scipy.ndimage as ndi
+
+
+# scipy.ndimage boundary modes and their np.pad() equivalents
+PAD_MODES = {
+    "reflect": "symmetric",
+    "mirror": "reflect",
+    "nearest": "edge",
+    "wrap": "wrap",
+    "constant": "constant",
+}
+
+
+def _footprint(size, footprint, ndim):
+    if footprint is not None:
+        return np.asarray(footprint, dtype=bool)
+    if size is None:
+        raise ValueError("Give either size or footprint.")
+    return np.ones(np.broadcast_to(size, ndim), dtype=bool)
+
+
+def _reach(footprint):
+    """
+    Number of pixels the footprint reaches before and after its center
+    along each axis (scipy centers a length-n axis at index n // 2).
+    """
+    return [(n // 2, n - 1 - n // 2) for n in footprint.shape]
+
+
+def pad_image(image, reach, mode="reflect", cval=0.0):
+    """
+    Pad `image` by `reach` ((before, after) pairs per axis) the way
+    scipy.ndimage's boundary `mode` extends it.
+    """
+    if mode not in PAD_MODES:
+        raise ValueError(f"Unsupported mode {mode!r}.")
+    kwargs = {"constant_values": cval} if mode == "constant" else {}
+    return np.pad(image, reach, mode=PAD_MODES[mode], **kwargs)
+
+
+def tile_slices(shape, tile_shape, reach):
+    """
+    Yield (source, target) slice tuples that cover an image of `shape`
+    with tiles of `tile_shape`. `source` selects a tile plus a halo of
+    `reach` pixels from the image padded by pad_image(); `target`
+    selects the tile itself from the unpadded image.
+    """
+    starts = [range(0, n, t) for n, t in zip(shape, tile_shape)]
+    for corner in product(*starts):
+        source, target = [], []
+        for start, n, t, (before, after) in zip(
+            corner, shape, tile_shape, reach
+        ):
+            stop = min(start + t, n)
+            source.append(slice(start, stop + before + after))
+            target.append(slice(start, stop))
+        yield tuple(source), tuple(target)
+
+
+def _median_tile(tile, footprint, method):
+    """Median-filter a halo-padded tile and cut the halo off again."""
+    if method == "histogram":
+        return _padded_box_median(tile, footprint.shape)
+    crop = tuple(
+        slice(before, n - after)
+        for n, (before, after) in zip(tile.shape, _reach(footprint))
+    )
+    return ndi.median_filter(tile, footprint=footprint)[crop]
+
+
+def tiled_median_filter(
+    image,
+    size=None,
+    footprint=None,
+    mode="reflect",
+    cval=0.0,
+    tile_shape=(512, 512),
+    n_workers=None,
+    use_threads=False,
+    method="scipy",
+):
+    """
+    Median-filter a 2-D `image` in tiles of `tile_shape` on a pool of
+    `n_workers` processes (by default, one per CPU; threads if
+    `use_threads` is True). `size`, `footprint`, `mode` and `cval` mean
+    the same as in ndi.median_filter(), and the output is identical to
+    it. Set `method` to "histogram" to filter each tile with
+    box_median_filter() instead (box footprints only).
+    """
+    image = np.asarray(image)
+    footprint = _footprint(size, footprint, image.ndim)
+    if method == "histogram" and not footprint.all():
+        raise ValueError("The histogram method only supports box footprints.")
+    reach = _reach(footprint)
+    padded = pad_image(image, reach, mode, cval)
+    tile_shape = np.broadcast_to(tile_shape, image.ndim)
+    tiles = list(tile_slices(image.shape, tile_shape, reach))
+    output = np.empty_like(image)
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    pool_type = ThreadPoolExecutor if use_threads else ProcessPoolExecutor
+    with pool_type(n_workers) as pool:
+        futures = [
+            pool.submit(_median_tile, padded[source], footprint, method)
+            for source, _ in tiles
+        ]
+        for (_, target), future in zip(tiles, futures):
+            output[target] = future.result()
+    return output
+
+
+def _window_counts(array, shape):
+    """
+    Sum of `array` (which should already be padded) over every
+    fully-contained window of `shape`, via a summed-area table.
+    """
+    table = np.zeros(
+        tuple(n + 1 for n in array.shape),
+        dtype=np.min_scalar_type(array.size),
+    )
+    np.cumsum(array, axis=0, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    rows, columns = shape
+    return (
+        table[rows:, columns:]
+        - table[:-rows, columns:]
+        - table[rows:, :-columns]
+        + table[:-rows, :-columns]
+    )
+
+
+def _padded_box_median(padded, shape, max_levels=4096):
+    """
+    Median over every fully-contained window of `shape` in `padded`, by
+    counting window pixels at or below each distinct value.
+    """
+    levels, codes = np.unique(padded, return_inverse=True)
+    if len(levels) > max_levels:
+        raise ValueError(
+            f"Image has {len(levels)} distinct values; the histogram "
+            f"median supports at most {max_levels}."
+        )
+    codes = codes.reshape(padded.shape)
+    rows, columns = shape
+    # the median is the element at sorted position `rank`, i.e. the
+    # lowest level with more than `rank` window pixels at or below it
+    rank = rows * columns // 2
+    out_shape = (padded.shape[0] - rows + 1, padded.shape[1] - columns + 1)
+    median_code = np.zeros(out_shape, dtype=np.min_scalar_type(len(levels)))
+    for code in range(len(levels) - 1):
+        median_code += _window_counts(codes <= code, shape) <= rank
+    return levels[median_code]
+
+
+def box_median_filter(image, size, mode="reflect", cval=0.0, max_levels=4096):
+    """
+    Median filter a 2-D `image` over a box of `size` (an int or a
+    (rows, columns) tuple). The result is identical to
+    ndi.median_filter(image, size=size, mode=mode, cval=cval). Raises a
+    ValueError if `image` has more than `max_levels` distinct values,
+    since the cost grows with their number.
+    """
+    image = np.asarray(image)
+    shape = tuple(int(n) for n in np.broadcast_to(size, 2))
+    padded = pad_image(image, _reach(np.empty(shape)), mode, cval)
+    return _padded_box_median(padded, shape, max_levels)
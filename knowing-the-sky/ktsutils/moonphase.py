@@ -0,0 +1,55 @@
+"""
+Times of lunar phases, computed with astropy's built-in ephemeris (no
+network access needed), for picking out frames taken near a full moon
+and the like.
+"""
+import astropy.units as u
+from astropy.coordinates import GeocentricTrueEcliptic, get_body, get_sun
+from astropy.time import Time
+import numpy as np
+import pandas as pd
+
+
+def lunar_phase_angle(times):
+    """
+    Difference between the Moon's and the Sun's geocentric ecliptic
+    longitudes, in degrees from 0 to 360: 0 is new moon, 90 first
+    quarter, 180 full moon, 270 last quarter.
+    """
+    times = Time(times)
+    frame = GeocentricTrueEcliptic(equinox=times)
+    moon = get_body("moon", times).transform_to(frame).lon
+    sun = get_sun(times).transform_to(frame).lon
+    return (moon - sun).wrap_at(360 * u.deg).to_value(u.deg)
+
+
+def phase_times(start, stop, phase=180, step_hours=6):
+    """
+    UTC times between `start` and `stop` when the lunar phase angle (see
+    lunar_phase_angle()) passes `phase`, as a DatetimeIndex. Found by
+    sampling every `step_hours` and interpolating, which is good to a
+    minute or so.
+    """
+    start, stop = Time(pd.Timestamp(start)), Time(pd.Timestamp(stop))
+    step = step_hours / 24
+    jd = np.arange(start.jd, stop.jd + step, step)
+    # measure from `phase`, so that crossings are sign changes of an
+    # angle wrapped to [-180, 180)
+    angle = (lunar_phase_angle(Time(jd, format="jd")) - phase + 180) % 360
+    angle -= 180
+    crossing = np.flatnonzero(
+        (angle[:-1] < 0) & (angle[1:] >= 0) & (angle[1:] - angle[:-1] < 90)
+    )
+    before, after = angle[crossing], angle[crossing + 1]
+    crossing_jd = jd[crossing] + step * -before / (after - before)
+    crossing_jd = crossing_jd[
+        (crossing_jd >= start.jd) & (crossing_jd < stop.jd)
+    ]
+    return pd.DatetimeIndex(
+        Time(crossing_jd, format="jd").to_datetime(), tz="UTC"
+    )
+
+
+def full_moons(start, stop):
+    """UTC times of every full moon between `start` and `stop`."""
+    return phase_times(start, stop, phase=180)
@@ -1,5 +1,7 @@
 import cv2
 import numpy as np
+import pandas as pd
+import scipy.ndimage as ndi
 
 
 def mask2vec(arr):
@@ -10,48 +12,209 @@ def mask2vec(arr):
     return np.vstack(np.nonzero(arr.T)).T
 
 
-def mask2shape(
-    mask, 
-    shape = "circle", 
-    color = (0, 255, 255), 
-    thickness = 2,
-    draw_on_array = False
-):
+def mask_contour(mask):
     """
-    Draws the smallest possible circle, triangle, or rectangle around the 
-    'truthy' elements of a boolean or 0/1-valued ndarray. Returns both the 
-    shape parameters and the shape drawn in an ndarray. If `draw_on_mask` is 
-    True, draws the shape on top of the existing elements of the mask.
+    The extreme outer contour of the 'truthy' elements of a boolean or
+    0/1-valued ndarray, as an OpenCV point array. Raises a ValueError if
+    the mask is empty or has several separate regions, as mask2shape()
+    always has.
     """
-    if shape not in {"circle", "triangle", "rectangle"}:
-        raise ValueError("Shape can be 'circle', 'triangle', or 'rectangle'.")
-    if draw_on_array is False:
-        canvas = np.zeros([*mask.shape, 3], 'u1')
-    else:
-        canvas = np.moveaxis(
-            np.tile(np.where(mask, 255, 0).astype('u1'), [3, 1, 1]), 2, 1
-        ).T.copy()
     # We can generally get faster results by finding the extreme outer
-    # contour of the shape rather than directly reducing it to point 
-    # vectors (which implies something about how optimized findContours() is...)
-    (cont,), _ = cv2.findContours(
-        mask.astype('u1'), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE
+    # contour of the shape rather than directly reducing it to point
+    # vectors (which implies something about how optimized findContours()
+    # is...)
+    contours, _ = cv2.findContours(
+        mask.astype('u1', copy=False),
+        cv2.RETR_EXTERNAL,
+        cv2.CHAIN_APPROX_SIMPLE
     )
+    if len(contours) == 0:
+        raise ValueError("The mask has no truthy elements.")
+    if len(contours) > 1:
+        raise ValueError(
+            f"The mask has {len(contours)} separate regions, not one."
+        )
+    return contours[0]
+
+
+def shape_params(mask, shape="circle", contour=None):
+    """
+    Parameters of the smallest possible circle, triangle, or rectangle
+    around the 'truthy' elements of `mask`, in the same form mask2shape()
+    returns them, without drawing anything. Pass `contour` (from
+    mask_contour()) to skip finding it again.
+    """
+    if shape not in {"circle", "triangle", "rectangle"}:
+        raise ValueError("Shape can be 'circle', 'triangle', or 'rectangle'.")
+    cont = mask_contour(mask) if contour is None else contour
     param = {}
     if shape == "circle":
         (param['cx'], param['cy']), param['r'] = cv2.minEnclosingCircle(cont)
+    elif shape == "triangle":
+        param['area'], param['points'] = cv2.minEnclosingTriangle(cont)
+    else:
+        param['ul'], param['lr'], param['angle'] = cv2.minAreaRect(cont)
+    return param
+
+
+def mask_geometry(mask):
+    """
+    Geometry of the 'truthy' elements of `mask`, from a single contour
+    pass and without allocating any image: the enclosing circle, triangle
+    and rectangle parameters (as returned by shape_params()), plus
+    "mask_area" (number of truthy elements), "hull_area" and
+    "perimeter" of their convex hull, "solidity" (mask area over hull
+    area; the hull runs through pixel centers, so this can come out a
+    little over 1) and "circle_fill" (mask area over enclosing circle
+    area).
+    """
+    cont = mask_contour(mask)
+    mask_area = int(np.count_nonzero(mask))
+    circle = shape_params(mask, "circle", cont)
+    hull = cv2.convexHull(cont)
+    hull_area = cv2.contourArea(hull)
+    return {
+        "circle": circle,
+        "triangle": shape_params(mask, "triangle", cont),
+        "rectangle": shape_params(mask, "rectangle", cont),
+        "mask_area": mask_area,
+        "hull_area": hull_area,
+        "perimeter": cv2.arcLength(hull, True),
+        "solidity": mask_area / hull_area if hull_area > 0 else np.nan,
+        "circle_fill": mask_area / (np.pi * circle['r'] ** 2),
+    }
+
+
+LABEL_SHAPE_COLUMNS = [
+    "label",
+    "area",
+    "cx",
+    "cy",
+    "r",
+    "triangle_area",
+    "triangle_points",
+    "rect_cx",
+    "rect_cy",
+    "rect_width",
+    "rect_height",
+    "rect_angle",
+]
+
+
+def label_shapes(labels, label_ids=None, index=None):
+    """
+    Fit enclosing circles, triangles and rectangles to many labels of a
+    label image (like the output of scipy.ndimage.label()) at once. Each
+    label's contour is found in a crop of its bounding box, so the cost
+    depends on the labels' sizes rather than on the number of labels
+    times the size of the frame. `label_ids` defaults to every label.
+    `index` (from ktsutils.labels.label_index()) supplies bounding boxes
+    if you already have one; otherwise they're found in one pass.
+
+    Returns a DataFrame indexed by label, with the label's "area";
+    circle "cx", "cy", "r"; "triangle_area" and "triangle_points"; and
+    rectangle "rect_cx", "rect_cy", "rect_width", "rect_height",
+    "rect_angle". Coordinates are in the frame's x/y pixel coordinates.
+    An image with no labels gives an empty table.
+    """
+    labels = np.asarray(labels)
+    if index is not None:
+        boxes = {
+            l: (
+                slice(index["min_y"][l], index["max_y"][l] + 1),
+                slice(index["min_x"][l], index["max_x"][l] + 1),
+            )
+            for l in np.flatnonzero(index["area"][1:] > 0) + 1
+        }
+    else:
+        boxes = {
+            l: box
+            for l, box in enumerate(ndi.find_objects(labels), start=1)
+            if box is not None
+        }
+    if label_ids is None:
+        label_ids = sorted(boxes)
+    rows = []
+    for l in label_ids:
+        if l not in boxes:
+            raise ValueError(f"Label {l} isn't in the label image.")
+        y_slice, x_slice = boxes[l]
+        crop = (labels[y_slice, x_slice] == l).astype('u1')
+        # shift the contour back into frame coordinates
+        cont = mask_contour(crop) + np.array(
+            [x_slice.start, y_slice.start], dtype=np.int32
+        )
+        (cx, cy), r = cv2.minEnclosingCircle(cont)
+        triangle_area, triangle_points = cv2.minEnclosingTriangle(cont)
+        (rect_cx, rect_cy), (width, height), angle = cv2.minAreaRect(cont)
+        rows.append(
+            {
+                "label": l,
+                "area": int(crop.sum()),
+                "cx": cx,
+                "cy": cy,
+                "r": r,
+                "triangle_area": triangle_area,
+                "triangle_points": triangle_points.reshape(-1, 2),
+                "rect_cx": rect_cx,
+                "rect_cy": rect_cy,
+                "rect_width": width,
+                "rect_height": height,
+                "rect_angle": angle,
+            }
+        )
+    return pd.DataFrame(rows, columns=LABEL_SHAPE_COLUMNS).set_index("label")
+
+
+def shape_canvas(mask, draw_on_array=False):
+    """
+    An RGB canvas the size of `mask` to draw shapes on: black, or, if
+    `draw_on_array` is True, with the mask's truthy elements in white.
+    """
+    if draw_on_array is False:
+        return np.zeros([*mask.shape, 3], 'u1')
+    canvas = np.empty([*mask.shape, 3], 'u1')
+    canvas[:] = np.where(mask, 255, 0).astype('u1')[..., None]
+    return canvas
+
+
+def draw_shape(canvas, shape, param, color=(0, 255, 255), thickness=2):
+    """
+    Draw a shape described by `param` (from shape_params()) onto
+    `canvas` in place, and return the canvas.
+    """
+    if shape == "circle":
         cx, cy, r = map(lambda p: int(round(p)), param.values())
-        return param, cv2.circle(canvas, (cx, cy), r, color, thickness)
+        return cv2.circle(canvas, (cx, cy), r, color, thickness)
     if shape == "triangle":
-        param['area'], param['points'] = cv2.minEnclosingTriangle(cont)
-        return param, cv2.drawContours(
+        return cv2.drawContours(
             canvas, [param['points'].round().astype('i4')], 0, color, thickness
         )
-    param['ul'], param['lr'], param['angle'] = cv2.minAreaRect(cont)
-    return param, cv2.drawContours(
-        canvas, 
-        [cv2.boxPoints(tuple(param.values())).round().astype('i4')],
-        0,
-        color,
-        thickness
-    )
+    if shape == "rectangle":
+        return cv2.drawContours(
+            canvas,
+            [cv2.boxPoints(tuple(param.values())).round().astype('i4')],
+            0,
+            color,
+            thickness
+        )
+    raise ValueError("Shape can be 'circle', 'triangle', or 'rectangle'.")
+
+
+def mask2shape(
+    mask,
+    shape = "circle",
+    color = (0, 255, 255),
+    thickness = 2,
+    draw_on_array = False
+):
+    """
+    Draws the smallest possible circle, triangle, or rectangle around the
+    'truthy' elements of a boolean or 0/1-valued ndarray. Returns both the
+    shape parameters and the shape drawn in an ndarray. If `draw_on_mask` is
+    True, draws the shape on top of the existing elements of the mask.
+    Use shape_params() or mask_geometry() if you only need the parameters.
+    """
+    param = shape_params(mask, shape)
+    canvas = shape_canvas(mask, draw_on_array)
+    return param, draw_shape(canvas, shape, param, color, thickness)
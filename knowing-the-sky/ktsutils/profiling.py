@@ -0,0 +1,193 @@
+"""
+Per-stage timing and memory instrumentation for the fullness pipeline.
+
+Pipeline code marks its stages with
+
+    with stage_timer("erode"):
+        ...
+
+which does nothing (beyond entering a shared, empty context manager)
+unless a profiler is active. Inside
+
+    with profiling() as profiler:
+        fullness_algorithm(...)
+
+every stage records its wall time, CPU time, and (if `memory` is True,
+via tracemalloc) the peak number of bytes allocated while it ran, above
+what was allocated when it started. Stages can nest; each record carries
+its full 'stack' of enclosing stage names.
+
+profiler.records, or stage_records() of several runs (e.g. from
+different batch workers) concatenated together, can be summarized with
+stage_summary() or written out with write_trace() as a Chrome trace
+event file, which chrome://tracing, Perfetto and speedscope show as a
+flame graph.
+"""
+from contextlib import contextmanager, nullcontext
+import json
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+
+# the active StageProfiler, if any
+_profiler = None
+_disabled = nullcontext()
+
+RECORD_COLUMNS = [
+    "frame",
+    "stage",
+    "stack",
+    "depth",
+    "pid",
+    "start_us",
+    "wall_s",
+    "cpu_s",
+    "peak_bytes",
+]
+
+
+class StageProfiler:
+    """Collects one record per stage run while it's the active profiler."""
+
+    def __init__(self, memory=True):
+        self.memory = memory
+        self.frame = None
+        self.records = []
+        self._stack = []
+
+    @contextmanager
+    def stage(self, name):
+        parent = self._stack[-1] if self._stack else None
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                # a nested stage resets the peak, so fold it into the parent's
+                parent["peak"] = max(parent["peak"], peak)
+            tracemalloc.reset_peak()
+        else:
+            current = 0
+        entry = {"name": name, "base": current, "peak": current}
+        self._stack.append(entry)
+        start_us = time.time_ns() // 1000
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            peak_bytes = None
+            if self.memory:
+                entry["peak"] = max(
+                    entry["peak"], tracemalloc.get_traced_memory()[1]
+                )
+                peak_bytes = entry["peak"] - entry["base"]
+                if parent is not None:
+                    parent["peak"] = max(parent["peak"], entry["peak"])
+            self._stack.pop()
+            stack = [e["name"] for e in self._stack] + [name]
+            self.records.append(
+                {
+                    "frame": self.frame,
+                    "stage": name,
+                    "stack": ";".join(stack),
+                    "depth": len(self._stack),
+                    "pid": os.getpid(),
+                    "start_us": start_us,
+                    "wall_s": wall,
+                    "cpu_s": cpu,
+                    "peak_bytes": peak_bytes,
+                }
+            )
+
+
+def stage_timer(name):
+    """
+    A context manager that times the enclosed code as stage `name` if a
+    profiler is active, and does nothing otherwise.
+    """
+    if _profiler is None:
+        return _disabled
+    return _profiler.stage(name)
+
+
+def set_frame(frame):
+    """Tag the records that follow with `frame` (e.g. a file name)."""
+    if _profiler is not None:
+        _profiler.frame = frame
+
+
+@contextmanager
+def profiling(memory=True):
+    """
+    Make a new StageProfiler the active profiler for the duration of the
+    block, yielding it. If `memory` is True, tracemalloc is started (if
+    it isn't already running), which slows allocations down noticeably.
+    """
+    global _profiler
+    previous, profiler = _profiler, StageProfiler(memory)
+    started = memory and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    _profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _profiler = previous
+        if started:
+            tracemalloc.stop()
+
+
+def stage_records(records):
+    """Stage records (dicts, e.g. profiler.records) as a DataFrame."""
+    return pd.DataFrame(list(records), columns=RECORD_COLUMNS)
+
+
+def stage_summary(records):
+    """
+    Per-stage totals and means over every frame in `records` (a
+    DataFrame from stage_records()), with each stage's share of the
+    total wall time of the top-level stages.
+    """
+    grouped = records.groupby("stack", sort=False)
+    summary = grouped.agg(
+        calls=("wall_s", "size"),
+        wall_s=("wall_s", "sum"),
+        cpu_s=("cpu_s", "sum"),
+        mean_wall_ms=("wall_s", "mean"),
+        max_peak_bytes=("peak_bytes", "max"),
+    )
+    summary["mean_wall_ms"] *= 1000
+    top_level = records.loc[records["depth"] == 0, "wall_s"].sum()
+    summary["wall_share"] = summary["wall_s"] / top_level
+    return summary
+
+
+def write_trace(records, path):
+    """
+    Write `records` (a DataFrame from stage_records()) to `path` as a
+    Chrome trace event file, one track per worker process.
+    """
+    events = [
+        {
+            "name": record.stage,
+            "cat": "fullness",
+            "ph": "X",
+            "ts": int(record.start_us),
+            "dur": record.wall_s * 1e6,
+            "pid": int(record.pid),
+            "tid": int(record.pid),
+            "args": {
+                "frame": record.frame,
+                "cpu_s": record.cpu_s,
+                "peak_bytes": (
+                    None if pd.isna(record.peak_bytes)
+                    else int(record.peak_bytes)
+                ),
+            },
+        }
+        for record in records.itertuples()
+    ]
+    with open(path, "w") as stream:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, stream)
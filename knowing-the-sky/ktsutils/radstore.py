@@ -0,0 +1,184 @@
+"""
+A memory-mapped store of GOES radiance arrays, so that repeated passes
+over the same archive don't have to decode NetCDF files again.
+
+build_radiance_store() converts a set of NetCDF files once, appending
+each frame's filled radiance array (what
+ktsutils.fullness.load_goes_image() returns, cast to float32 so every
+frame has the same layout), its missing-data mask, and its metadata to
+a store directory:
+
+    radiance.bin   every frame's radiance, back to back
+    mask.bin       every frame's mask, as one byte per pixel
+    frames.parquet per-frame name, shape and byte offset, plus any other
+                   metadata (e.g. columns from a frame index)
+    failed.parquet name and error of each file that couldn't be read
+
+RadianceStore then hands out frames and cutouts as views into
+memory-mapped files, without copying or decoding anything; after the
+first pass, the operating system's page cache usually means not even
+reading from disk.
+"""
+import os
+from pathlib import Path
+
+from netCDF4 import Dataset
+import numpy as np
+import pandas as pd
+
+from ktsutils.fullness import NETCDF_LOCK
+from ktsutils.stream import read_ahead
+
+RADIANCE_DTYPE = np.dtype("f4")
+# the columns of frames.parquet that describe the layout of the store
+FRAME_COLUMNS = ["name", "height", "width", "offset", "pixels", "masked"]
+FAILED_COLUMNS = ["name", "error"]
+
+
+def load_radiance_and_mask(path):
+    """
+    Filled radiance array (as RADIANCE_DTYPE) and boolean missing-data
+    mask of a file.
+    """
+    with NETCDF_LOCK, Dataset(path) as nc:
+        array = nc.variables['radiance'][:]
+    return array.filled(0).astype(RADIANCE_DTYPE), np.ma.getmaskarray(array)
+
+
+def build_radiance_store(
+    paths, store_dir, metadata=None, max_in_flight=4, n_threads=1
+):
+    """
+    Add the radiance arrays of NetCDF files at `paths` to the store in
+    `store_dir`, creating it if necessary. Files already in the store are
+    skipped, so this can be rerun to add new files or to finish an
+    interrupted conversion. `metadata` is an optional DataFrame with a
+    'name' column (e.g. a frame index from ktsutils.goes) whose other
+    columns are saved along with each frame. Files that can't be read are
+    left out of the store and listed, with the reason, in its 'failed'
+    table; a later run retries them. Returns a RadianceStore.
+    """
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    frames_path = store_dir / "frames.parquet"
+    records = []
+    if frames_path.exists():
+        records = pd.read_parquet(frames_path).to_dict("records")
+    stored = {record["name"] for record in records}
+    paths = [p for p in paths if Path(p).name not in stored]
+    failed_path = store_dir / "failed.parquet"
+    failed = []
+    if failed_path.exists():
+        # keep earlier failures that this run doesn't retry
+        retried = {Path(p).name for p in paths}
+        failed = [
+            record
+            for record in pd.read_parquet(failed_path).to_dict("records")
+            if record["name"] not in retried | stored
+        ]
+    radiance_path = store_dir / "radiance.bin"
+    mask_path = store_dir / "mask.bin"
+    # throw away anything written after the last frame we recorded, e.g.
+    # by a conversion that was interrupted
+    offset = 0
+    if records:
+        offset = records[-1]["offset"] + records[-1]["pixels"]
+    for path, itemsize in (
+        (radiance_path, RADIANCE_DTYPE.itemsize), (mask_path, 1)
+    ):
+        path.touch()
+        os.truncate(path, offset * itemsize)
+    frames = read_ahead(
+        paths,
+        loader=load_radiance_and_mask,
+        max_in_flight=max_in_flight,
+        n_threads=n_threads,
+    )
+    radiance_file, mask_file = open(radiance_path, "ab"), open(mask_path, "ab")
+    with radiance_file, mask_file:
+        for frame in frames:
+            if "error" in frame:
+                failed.append({"name": frame["name"], "error": frame["error"]})
+                continue
+            radiance, mask = frame["image"]
+            radiance_file.write(np.ascontiguousarray(radiance).data)
+            mask_file.write(np.ascontiguousarray(mask, dtype="u1").data)
+            records.append(
+                {
+                    "name": frame["name"],
+                    "height": radiance.shape[0],
+                    "width": radiance.shape[1],
+                    "offset": offset,
+                    "pixels": radiance.size,
+                    "masked": int(mask.sum()),
+                }
+            )
+            offset += radiance.size
+    table = pd.DataFrame(records)
+    if metadata is not None and len(table) > 0:
+        extra = metadata.drop(columns=FRAME_COLUMNS[1:], errors="ignore")
+        table = table[FRAME_COLUMNS].merge(extra, on="name", how="left")
+    table.to_parquet(frames_path, index=False)
+    pd.DataFrame(failed, columns=FAILED_COLUMNS).to_parquet(
+        failed_path, index=False
+    )
+    return RadianceStore(store_dir)
+
+
+class RadianceStore:
+    """
+    Read-only, memory-mapped access to a store made by
+    build_radiance_store(). Frames can be looked up by position or by
+    filename; everything returned is a view into the mapped files.
+    `failed` lists the files that couldn't be added, if any.
+    """
+
+    def __init__(self, store_dir):
+        self.store_dir = Path(store_dir)
+        self.frames = pd.read_parquet(self.store_dir / "frames.parquet")
+        failed_path = self.store_dir / "failed.parquet"
+        self.failed = pd.DataFrame(columns=FAILED_COLUMNS)
+        if failed_path.exists():
+            self.failed = pd.read_parquet(failed_path)
+        self.positions = pd.Series(
+            np.arange(len(self.frames)), index=self.frames["name"]
+        )
+        self.layout = self.frames[
+            ["offset", "pixels", "height", "width"]
+        ].to_numpy(dtype=np.int64)
+        self.radiance = self._map("radiance.bin", RADIANCE_DTYPE)
+        self.masks = self._map("mask.bin", np.dtype(bool))
+
+    def _map(self, filename, dtype):
+        path = self.store_dir / filename
+        if path.stat().st_size == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    def __len__(self):
+        return len(self.frames)
+
+    def _locate(self, frame):
+        if isinstance(frame, str):
+            frame = self.positions[frame]
+        offset, pixels, height, width = self.layout[frame]
+        return slice(offset, offset + pixels), (height, width)
+
+    def image(self, frame):
+        """The radiance array of `frame` (a position or filename)."""
+        span, shape = self._locate(frame)
+        return self.radiance[span].reshape(shape)
+
+    def mask(self, frame):
+        """The missing-data mask of `frame` (a position or filename)."""
+        span, shape = self._locate(frame)
+        return self.masks[span].reshape(shape)
+
+    def cutout(self, frame, min_y, max_y, min_x, max_x):
+        """A view of the inclusive box (min_y, max_y, min_x, max_x)."""
+        return self.image(frame)[min_y:max_y + 1, min_x:max_x + 1]
+
+    def __iter__(self):
+        """Yield (name, radiance) pairs for every frame."""
+        for position, name in enumerate(self.frames["name"]):
+            yield name, self.image(position)
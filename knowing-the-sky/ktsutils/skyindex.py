@@ -0,0 +1,157 @@
+"""
+A spatial index for star catalogs, so that cone searches, RA/Dec boxes,
+and nearest-neighbor lookups don't have to scan the whole table.
+
+Cone and nearest-neighbor queries use a KD-tree built on unit vectors,
+which has no trouble with RA wraparound or the poles because it never
+looks at RA/Dec directly. Box queries use the catalog sorted by
+declination: a binary search finds the declination band, and only that
+band is checked for RA.
+"""
+from pathlib import Path
+import pickle
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# bump this if the saved format changes
+INDEX_VERSION = 1
+
+
+def radec_to_xyz(ra, dec):
+    """Convert RA/Dec in decimal degrees to an (n, 3) array of unit vectors."""
+    ra, dec = np.radians(ra), np.radians(dec)
+    cos_dec = np.cos(dec)
+    return np.column_stack(
+        [cos_dec * np.cos(ra), cos_dec * np.sin(ra), np.sin(dec)]
+    )
+
+
+def _chord(separation):
+    """Straight-line distance between unit vectors `separation` deg apart."""
+    return 2 * np.sin(np.radians(np.clip(separation, 0, 180)) / 2)
+
+
+def _separation(chord):
+    """Inverse of _chord()."""
+    return np.degrees(2 * np.arcsin(np.clip(chord / 2, 0, 1)))
+
+
+class SkyIndex:
+    """
+    Spatial index over a set of RA/Dec positions in decimal degrees. Query
+    methods return positional row numbers (suitable for `DataFrame.iloc`)
+    into the arrays the index was built from. Rows with non-finite
+    coordinates are never returned.
+    """
+
+    def __init__(self, ra, dec):
+        ra = np.asarray(ra, dtype=np.float64)
+        dec = np.asarray(dec, dtype=np.float64)
+        if ra.shape != dec.shape or ra.ndim != 1:
+            raise ValueError("ra and dec must be 1-D arrays of equal length.")
+        self.n_rows = len(ra)
+        # positional row numbers of the rows we actually indexed
+        self.rows = np.flatnonzero(np.isfinite(ra) & np.isfinite(dec))
+        self.ra, self.dec = np.mod(ra[self.rows], 360), dec[self.rows]
+        self.tree = cKDTree(radec_to_xyz(self.ra, self.dec))
+        self.dec_order = np.argsort(self.dec, kind="stable")
+        self.sorted_dec = self.dec[self.dec_order]
+
+    @classmethod
+    def from_catalog(cls, catalog, ra_column="RAJ2000", dec_column="DEJ2000"):
+        """Build an index from a DataFrame with decimal-degree coordinates."""
+        return cls(
+            catalog[ra_column].to_numpy(), catalog[dec_column].to_numpy()
+        )
+
+    def cone(self, ra, dec, radius):
+        """Rows within `radius` degrees of (`ra`, `dec`), in row order."""
+        (center,) = radec_to_xyz(ra, dec)
+        hits = self.tree.query_ball_point(center, _chord(radius))
+        return np.sort(self.rows[np.asarray(hits, dtype=np.intp)])
+
+    def box(self, ra_min, ra_max, dec_min, dec_max):
+        """
+        Rows with `dec_min` <= Dec <= `dec_max` and RA in [`ra_min`,
+        `ra_max`], in row order. If `ra_min` > `ra_max`, the box wraps
+        through RA 0: for instance, `box(350, 10, ...)` covers 20 degrees of
+        RA centered on 0. A box that reaches a pole includes every RA at
+        that pole, as it should.
+        """
+        start = np.searchsorted(self.sorted_dec, dec_min, side="left")
+        stop = np.searchsorted(self.sorted_dec, dec_max, side="right")
+        band = self.dec_order[start:stop]
+        ra_band = self.ra[band]
+        if ra_max - ra_min >= 360:
+            in_ra = np.ones(len(band), dtype=bool)
+        else:
+            ra_min, ra_max = ra_min % 360, ra_max % 360
+            if ra_min <= ra_max:
+                in_ra = (ra_band >= ra_min) & (ra_band <= ra_max)
+            else:
+                in_ra = (ra_band >= ra_min) | (ra_band <= ra_max)
+        return np.sort(self.rows[band[in_ra]])
+
+    def nearest(self, ra, dec, k=1):
+        """
+        The `k` rows nearest to (`ra`, `dec`). Returns a tuple of
+        (separations in degrees, rows), both sorted by separation, with
+        fewer than `k` rows (none, for an empty index) if the index has
+        fewer.
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, not {k}.")
+        if len(self.rows) == 0:
+            return np.zeros(0), self.rows
+        (center,) = radec_to_xyz(ra, dec)
+        k = min(k, len(self.rows))
+        chords, hits = self.tree.query(center, k=[*range(1, k + 1)])
+        return _separation(chords), self.rows[hits]
+
+    def save(self, path):
+        """Write the index (including the built tree) to `path`."""
+        with open(path, "wb") as stream:
+            pickle.dump({"version": INDEX_VERSION, "index": self}, stream)
+
+    @staticmethod
+    def load(path):
+        """Read an index written by `save()`."""
+        with open(path, "rb") as stream:
+            saved = pickle.load(stream)
+        if saved.get("version") != INDEX_VERSION:
+            raise ValueError(f"{path} was written by an incompatible version.")
+        return saved["index"]
+
+
+def index_path(catalog_path):
+    """
+    Where the index for a catalog file lives: next to it, e.g.
+    'bsc_clean.csv' -> 'bsc_clean.skyindex.pkl'.
+    """
+    catalog_path = Path(catalog_path)
+    return catalog_path.with_name(f"{catalog_path.stem}.skyindex.pkl")
+
+
+def load_or_build_index(
+    catalog_path, catalog=None, ra_column="RAJ2000", dec_column="DEJ2000"
+):
+    """
+    Load the saved index for the catalog file at `catalog_path`, or build
+    and save one if there isn't one yet or the catalog file is newer than
+    it. If `catalog` (the already-loaded DataFrame) is not given and the
+    index needs to be built, reads `catalog_path` as CSV.
+    """
+    catalog_path = Path(catalog_path)
+    saved = index_path(catalog_path)
+    catalog_mtime = catalog_path.stat().st_mtime
+    if saved.exists() and saved.stat().st_mtime >= catalog_mtime:
+        index = SkyIndex.load(saved)
+        if catalog is None or index.n_rows == len(catalog):
+            return index
+    if catalog is None:
+        catalog = pd.read_csv(catalog_path, usecols=[ra_column, dec_column])
+    index = SkyIndex.from_catalog(catalog, ra_column, dec_column)
+    index.save(saved)
+    return index
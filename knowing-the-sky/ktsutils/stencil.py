@@ -0,0 +1,99 @@
+"""
+Stencil and compositing helpers for overlaying labels on images, as in
+the `apply_2d_stencil()` / `labelstencil()` examples in lesson 6.
+
+Those examples copy the 2-D mask three times with np.tile() to match an
+RGB image and let np.where() allocate a new image on every call. These
+versions broadcast the mask across color bands instead
+(`stencil_2d[..., None]`), can write into an existing output array, and
+turn label numbers into masks or colors with a single lookup-table
+gather rather than one comparison per label.
+"""
+import numpy as np
+
+
+def _bands(image, stencil_2d):
+    """View a 2-D stencil so that it broadcasts against `image`."""
+    if image.ndim == stencil_2d.ndim + 1:
+        return stencil_2d[..., None]
+    return stencil_2d
+
+
+def apply_2d_stencil(color_image, stencil_2d, out=None, fill=0):
+    """
+    `color_image` where `stencil_2d` is True, `fill` elsewhere. Writes
+    into `out` if given (which may be `color_image` itself, to stencil it
+    in place).
+    """
+    stencil = _bands(color_image, np.asarray(stencil_2d, dtype=bool))
+    if out is color_image:
+        np.copyto(out, fill, where=~stencil)
+        return out
+    if out is None:
+        out = np.empty_like(color_image)
+    out[...] = fill
+    np.copyto(out, color_image, where=stencil)
+    return out
+
+
+def label_lut(label_numbers, n_labels, value=True, fill=False, dtype=bool):
+    """
+    A lookup table of length `n_labels` + 1 that maps each of
+    `label_numbers` to `value` and every other label to `fill`.
+    Numbers outside 0..`n_labels` match no label and are ignored.
+    Index it with a label array (`lut[labels]`) to get a stencil.
+    """
+    lut = np.full(n_labels + 1, fill, dtype=dtype)
+    label_numbers = np.asarray(label_numbers, dtype=np.intp)
+    in_range = (label_numbers >= 0) & (label_numbers <= n_labels)
+    lut[label_numbers[in_range]] = value
+    return lut
+
+
+def labelstencil(color_image, label_array, label_numbers, out=None):
+    """
+    Return a copy of `color_image` blacked out wherever the values of
+    'label_array' don't fall within 'label_numbers' (or write it into
+    `out`).
+    """
+    n_labels = max(
+        int(label_array.max(initial=0)), int(np.max(label_numbers, initial=0))
+    )
+    lut = label_lut(label_numbers, n_labels)
+    return apply_2d_stencil(color_image, lut[label_array], out=out)
+
+
+def color_labels(label_array, colors, out=None, dtype='u1'):
+    """
+    Paint every label of `label_array` in one lookup-table pass.
+    `colors` is either an array with one row (e.g. an RGB triple) per
+    label number, starting from 0, or a dict like {label: color}, in
+    which case labels not in the dict are black, negative keys are
+    ignored, and the image has type `dtype`. Writes into `out` if given.
+    """
+    if isinstance(colors, dict):
+        n_bands = np.shape(next(iter(colors.values())))
+        n_labels = max(int(label_array.max(initial=0)), max(colors))
+        lut = np.zeros((n_labels + 1, *n_bands), dtype=dtype)
+        for label, color in colors.items():
+            if label >= 0:
+                lut[label] = color
+        colors = lut
+    return np.take(np.asarray(colors), label_array, axis=0, out=out)
+
+
+def composite(base, layer, stencil_2d=None, out=None):
+    """
+    Lay `layer` over `base`: take `layer`'s pixels wherever `stencil_2d`
+    is True (by default, wherever any band of `layer` is nonzero) and
+    `base`'s elsewhere. Writes into `out` if given; `out` may be `base`
+    itself.
+    """
+    if stencil_2d is None:
+        stencil_2d = layer.any(axis=-1) if layer.ndim == 3 else layer != 0
+    if out is None:
+        out = base.copy()
+    elif out is not base:
+        out[...] = base
+    np.copyto(out, layer, where=_bands(out, stencil_2d), casting="unsafe")
+    return out
@@ -0,0 +1,179 @@
+"""
+A streaming version of the lunar fullness pipeline. Rather than loading
+every image into a list and then processing the list, frames flow one at
+a time through a chain of generators:
+
+    load -> outline -> erode -> label -> measure -> emit
+
+Loading happens in a background thread a few frames ahead of the rest of
+the chain, so NetCDF decoding overlaps with the array work, but never
+more than `max_in_flight` frames are held at once. Each stage also drops
+the arrays later stages don't need, so peak memory depends on the frame
+size and `max_in_flight`, not on the number of files.
+
+Frames are dicts. A frame that fails at any stage gets an 'error' entry
+and is passed through the remaining stages untouched, so one bad file
+doesn't stop the stream.
+"""
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import scipy.ndimage as ndi
+
+from ktsutils.fullness import (
+    check_label_boxes,
+    compare_to_circle,
+    erode,
+    filter_labels,
+    load_goes_image,
+    make_mask_and_cutout,
+    make_outline,
+    moon_pixels,
+)
+from ktsutils.labels import label_index
+from ktsutils.profiling import set_frame, stage_timer
+
+
+def read_ahead(paths, loader=load_goes_image, max_in_flight=4, n_threads=1):
+    """
+    Load each of `paths` with `loader` in a pool of `n_threads` threads,
+    keeping at most `max_in_flight` loads queued or finished-but-unused.
+    Yields frame dicts like {'name': ..., 'image': ...}, in the order of
+    `paths`.
+
+    netCDF4 isn't thread-safe, so a loader that reads NetCDF files must
+    hold ktsutils.fullness.NETCDF_LOCK while it does, like
+    load_goes_image(). Those loads then run one at a time however many
+    threads there are, so more than one thread only helps loaders that
+    don't use netCDF4.
+    """
+    paths, queue = iter(paths), deque()
+    with ThreadPoolExecutor(n_threads) as pool:
+        for path in paths:
+            queue.append((path, pool.submit(loader, path)))
+            if len(queue) >= max_in_flight:
+                break
+        while queue:
+            path, future = queue.popleft()
+            # top the queue back up before waiting on the oldest load
+            for next_path in paths:
+                queue.append((next_path, pool.submit(loader, next_path)))
+                break
+            frame = {"name": Path(path).name}
+            try:
+                frame["image"] = future.result()
+            except Exception as ex:
+                frame["error"] = f"{type(ex).__name__}: {ex}"
+            yield frame
+
+
+def stage(func):
+    """
+    Turn `func(frame, **params)`, which updates a single frame in place,
+    into a generator stage over a stream of frames that passes failed
+    frames through and records any exception raised in 'error'.
+    """
+    def run_stage(frames, **params):
+        for frame in frames:
+            if "error" not in frame:
+                set_frame(frame["name"])
+                try:
+                    with stage_timer(func.__name__):
+                        func(frame, **params)
+                except Exception as ex:
+                    frame["error"] = f"{type(ex).__name__}: {ex}"
+            yield frame
+
+    run_stage.__name__, run_stage.__doc__ = func.__name__, func.__doc__
+    return run_stage
+
+
+@stage
+def outline_frames(frame, threshold):
+    frame["outline"] = make_outline(frame["image"], threshold)
+
+
+@stage
+def erode_frames(frame, erosion_size):
+    frame["eroded"] = erode(frame.pop("outline"), erosion_size)
+
+
+@stage
+def label_frames(frame):
+    labels, n_labels = ndi.label(frame.pop("eroded"))
+    frame["index"] = label_index(labels, n_labels)
+
+
+@stage
+def measure_frames(
+    frame, min_width, min_height, edge_size, dilation_size, cutout_margin
+):
+    """Pick out the Moon label and compute its fullness."""
+    image, index = frame.pop("image"), frame.pop("index")
+    label_statuses = check_label_boxes(
+        index, image.shape, min_width, min_height, edge_size
+    )
+    frame["status"], frame["moonlabel"] = filter_labels(label_statuses)
+    if frame["status"] != "ok":
+        return
+    _, moonmask = make_mask_and_cutout(
+        image,
+        moon_pixels(index, frame["moonlabel"]),
+        dilation_size,
+        cutout_margin,
+    )
+    frame["fullness"], _ = compare_to_circle(moonmask, draw=False)
+
+
+def emit(frames):
+    """
+    Reduce each frame to a flat record with 'name', 'status', 'moonlabel',
+    'fullness' and 'error', following the conventions of
+    ktsutils.batch.process_file().
+    """
+    for frame in frames:
+        record = {
+            "name": frame["name"],
+            "status": frame.get("status", "failed"),
+            "moonlabel": frame.get("moonlabel"),
+            "fullness": frame.get("fullness", np.nan),
+            "error": frame.get("error"),
+        }
+        if record["error"] is None and record["status"] != "ok":
+            record["error"] = record["status"]
+        yield record
+
+
+def stream_fullness(
+    paths,
+    threshold,
+    erosion_size,
+    min_width,
+    min_height,
+    edge_size,
+    dilation_size,
+    cutout_margin,
+    max_in_flight=4,
+    n_threads=1,
+):
+    """
+    Lazily run the fullness pipeline over `paths`, yielding one record
+    per file (see emit()). Wrap in pd.DataFrame() to collect the results.
+    """
+    frames = read_ahead(
+        paths, max_in_flight=max_in_flight, n_threads=n_threads
+    )
+    frames = outline_frames(frames, threshold=threshold)
+    frames = erode_frames(frames, erosion_size=erosion_size)
+    frames = label_frames(frames)
+    frames = measure_frames(
+        frames,
+        min_width=min_width,
+        min_height=min_height,
+        edge_size=edge_size,
+        dilation_size=dilation_size,
+        cutout_margin=cutout_margin,
+    )
+    return emit(frames)
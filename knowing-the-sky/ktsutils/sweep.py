@@ -0,0 +1,241 @@
+"""
+Parameter sweeps over the lunar fullness pipeline that don't redo work.
+
+fullness_algorithm() runs every stage from scratch on every call, so a
+grid search over, say, DILATION_SIZE recomputes the same outline, erosion
+and labels over and over. staged_fullness() runs the same stages, but
+caches each stage's output in a StageCache keyed by the image and only
+the parameters that stage (and the stages before it) depend on:
+
+    outline:  threshold
+    eroded:   + erosion_size
+    labels:   (same as eroded)
+    statuses: + min_width, min_height, edge_size
+    mask:     + cutout_margin
+    dilated:  + dilation_size
+    fullness: (same as dilated)
+
+so changing a late-stage parameter only reruns the late stages.
+"""
+from collections import OrderedDict
+import hashlib
+from itertools import product
+import sys
+
+import numpy as np
+import pandas as pd
+import scipy.ndimage as ndi
+
+from ktsutils.fullness import (
+    check_label_boxes,
+    compare_to_circle,
+    dilate,
+    erode,
+    filter_labels,
+    make_mask_and_cutout,
+    make_outline,
+    moon_pixels,
+)
+from ktsutils.labels import label_index
+
+# the parameters each stage's output depends on, in pipeline order
+STAGE_PARAMETERS = {
+    "outline": ("threshold",),
+    "eroded": ("threshold", "erosion_size"),
+    "labels": ("threshold", "erosion_size"),
+    "statuses": (
+        "threshold", "erosion_size", "min_width", "min_height", "edge_size"
+    ),
+    "mask": (
+        "threshold",
+        "erosion_size",
+        "min_width",
+        "min_height",
+        "edge_size",
+        "cutout_margin",
+    ),
+    "dilated": (
+        "threshold",
+        "erosion_size",
+        "min_width",
+        "min_height",
+        "edge_size",
+        "cutout_margin",
+        "dilation_size",
+    ),
+}
+STAGE_PARAMETERS["fullness"] = STAGE_PARAMETERS["dilated"]
+
+
+def image_key(image):
+    """A short content hash identifying an image array."""
+    image = np.ascontiguousarray(image)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str((image.shape, image.dtype.str)).encode())
+    digest.update(image.data)
+    return digest.hexdigest()
+
+
+def nbytes(value):
+    """Approximate memory footprint of a cached stage output."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(nbytes(v) for v in value.values()) + sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sum(nbytes(v) for v in value) + sys.getsizeof(value)
+    return sys.getsizeof(value)
+
+
+class StageCache:
+    """
+    Least-recently-used cache of stage outputs that evicts entries once
+    their total size goes over `memory_budget` bytes.
+    """
+
+    def __init__(self, memory_budget=1024 ** 3):
+        self.memory_budget = memory_budget
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = {}
+        self.misses = {}
+
+    def get(self, stage, key, params, compute):
+        """
+        Return the cached output of `stage` for image `key` with `params`,
+        calling `compute()` to produce it if it isn't cached.
+        """
+        cache_key = (
+            stage, key, tuple(params[p] for p in STAGE_PARAMETERS[stage])
+        )
+        if cache_key in self.entries:
+            self.entries.move_to_end(cache_key)
+            self.hits[stage] = self.hits.get(stage, 0) + 1
+            return self.entries[cache_key][0]
+        self.misses[stage] = self.misses.get(stage, 0) + 1
+        value = compute()
+        size = nbytes(value)
+        self.entries[cache_key] = (value, size)
+        self.size += size
+        # never evict the entry we just made, even if it alone is too big
+        while self.size > self.memory_budget and len(self.entries) > 1:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.size -= evicted_size
+        return value
+
+    def stats(self):
+        """Hit and miss counts for each stage, as a DataFrame."""
+        stages = [s for s in STAGE_PARAMETERS if s in self.hits | self.misses]
+        return pd.DataFrame(
+            {
+                "hits": [self.hits.get(s, 0) for s in stages],
+                "misses": [self.misses.get(s, 0) for s in stages],
+            },
+            index=stages,
+        )
+
+
+def staged_fullness(
+    image,
+    cache,
+    threshold,
+    erosion_size,
+    min_width,
+    min_height,
+    edge_size,
+    dilation_size,
+    cutout_margin,
+    key=None,
+):
+    """
+    Same results as fullness_algorithm() (without 'labels'), with every
+    stage memoized in `cache`. `key` identifies the image in the cache;
+    if it's not given, it's computed from the image's contents.
+    """
+    key = image_key(image) if key is None else key
+    params = {
+        "threshold": threshold,
+        "erosion_size": erosion_size,
+        "min_width": min_width,
+        "min_height": min_height,
+        "edge_size": edge_size,
+        "dilation_size": dilation_size,
+        "cutout_margin": cutout_margin,
+    }
+    outline = cache.get(
+        "outline", key, params, lambda: make_outline(image, threshold)
+    )
+    eroded = cache.get(
+        "eroded", key, params, lambda: erode(outline, erosion_size)
+    )
+    index = cache.get(
+        "labels", key, params, lambda: label_index(*ndi.label(eroded))
+    )
+    label_statuses = cache.get(
+        "statuses",
+        key,
+        params,
+        lambda: check_label_boxes(
+            index, image.shape, min_width, min_height, edge_size
+        ),
+    )
+    status, moonlabel = filter_labels(label_statuses)
+    output = {
+        "status": status,
+        "moonlabel": moonlabel,
+        "label_statuses": label_statuses,
+    }
+    if status != "ok":
+        return output
+    # cut out the Moon without dilating it, so that the cutout can be
+    # shared between different dilation sizes
+    cutout, mask = cache.get(
+        "mask",
+        key,
+        params,
+        lambda: make_mask_and_cutout(
+            image, moon_pixels(index, moonlabel), None, cutout_margin
+        ),
+    )
+    moonmask = cache.get(
+        "dilated", key, params, lambda: dilate(mask, dilation_size)
+    )
+    fullness, circle = cache.get(
+        "fullness", key, params, lambda: compare_to_circle(moonmask)
+    )
+    return output | {
+        'moonmask': moonmask,
+        'cutout': cutout,
+        'circle': circle,
+        'fullness': fullness
+    }
+
+
+def sweep_fullness(images, grid, cache=None, keys=None):
+    """
+    Run staged_fullness() on each of `images` for every combination of
+    the parameter values in `grid`, a dict like
+    {'threshold': [40], 'dilation_size': [None, 3, 5, 7], ...} that must
+    give values for every fullness_algorithm() parameter. `keys`
+    optionally names the images (e.g. by filename) so they needn't be
+    hashed. Returns a DataFrame with one row per image and parameter
+    combination.
+    """
+    cache = StageCache() if cache is None else cache
+    if keys is None:
+        keys = [image_key(image) for image in images]
+    names = list(grid.keys())
+    rows = []
+    for key, image in zip(keys, images):
+        for values in product(*grid.values()):
+            params = dict(zip(names, values))
+            result = staged_fullness(image, cache, key=key, **params)
+            rows.append(
+                {"image": key}
+                | params
+                | {
+                    "status": result["status"],
+                    "fullness": result.get("fullness", np.nan),
+                }
+            )
+    return pd.DataFrame(rows)
@@ -0,0 +1,298 @@
+"""
+Synthetic data for benchmarking, so we can try things out at scales
+(and in places) where we don't have real data handy.
+"""
+from pathlib import Path
+
+from netCDF4 import Dataset
+import numpy as np
+import pandas as pd
+
+
+def _digit_columns(values, n_digits):
+    """ASCII codes for the zero-padded decimal digits of integer `values`."""
+    powers = 10 ** np.arange(n_digits - 1, -1, -1)
+    return ((values[:, None] // powers) % 10).astype("u1") + ord("0")
+
+
+def format_sexagesimal(degrees, kind):
+    """
+    Format decimal degrees as fixed-width byte strings in the layout of the
+    Bright Star Catalog's RAJ2000 ("hh mm ss.s", kind="ra") or DEJ2000
+    ("+dd mm ss", kind="dec") columns. Works directly on bytes so that
+    formatting 10^7 values is quick.
+    """
+    degrees = np.asarray(degrees, dtype=np.float64)
+    n = len(degrees)
+    space = np.full((n, 1), ord(" "), "u1")
+    if kind == "ra":
+        # tenths of a second of time
+        ticks = np.round(np.mod(degrees, 360) / 15 * 36000).astype(np.int64)
+        ticks %= 24 * 36000
+        parts = [
+            _digit_columns(ticks // 36000, 2),
+            space,
+            _digit_columns(ticks // 600 % 60, 2),
+            space,
+            _digit_columns(ticks // 10 % 60, 2),
+            np.full((n, 1), ord("."), "u1"),
+            _digit_columns(ticks % 10, 1),
+        ]
+    elif kind == "dec":
+        # whole seconds of arc
+        ticks = np.round(np.abs(degrees) * 3600).astype(np.int64)
+        sign = np.where(degrees < 0, ord("-"), ord("+")).astype("u1")
+        parts = [
+            sign[:, None],
+            _digit_columns(ticks // 3600, 2),
+            space,
+            _digit_columns(ticks // 60 % 60, 2),
+            space,
+            _digit_columns(ticks % 60, 2),
+        ]
+    else:
+        raise ValueError("kind can be 'ra' or 'dec'.")
+    matrix = np.ascontiguousarray(np.hstack(parts))
+    return matrix.view(f"S{matrix.shape[1]}").ravel()
+
+
+def random_sky_positions(n, rng):
+    """`n` RA/Dec pairs in decimal degrees, uniform on the sky."""
+    ra = rng.uniform(0, 360, n)
+    dec = np.degrees(np.arcsin(rng.uniform(-1, 1, n)))
+    return ra, dec
+
+
+def random_sexagesimal(n, kind, seed=0):
+    """
+    `n` random RAJ2000- or DEJ2000-style strings; see format_sexagesimal().
+    """
+    ra, dec = random_sky_positions(n, np.random.default_rng(seed))
+    return format_sexagesimal(ra if kind == "ra" else dec, kind)
+
+
+def synthetic_catalog(n, seed=0, first_hr=1, blank_fraction=0.001):
+    """
+    A star catalog with `n` rows laid out like the raw Bright Star Catalog
+    from lesson 2: 'HR' (a unique running number starting at `first_hr`),
+    sexagesimal-string 'RAJ2000' and 'DEJ2000' columns, and 'Vmag'.
+    Positions are uniform on the sky; about `blank_fraction` of rows have
+    blank coordinates, like a few of the real catalog's entries.
+    """
+    rng = np.random.default_rng(seed)
+    ra, dec = random_sky_positions(n, rng)
+    ra_strings = format_sexagesimal(ra, "ra").astype("U")
+    dec_strings = format_sexagesimal(dec, "dec").astype("U")
+    blank = rng.random(n) < blank_fraction
+    ra_strings[blank], dec_strings[blank] = "", ""
+    return pd.DataFrame(
+        {
+            "HR": np.arange(first_hr, first_hr + n),
+            "RAJ2000": ra_strings,
+            "DEJ2000": dec_strings,
+            "Vmag": rng.normal(6, 1.5, n).round(2).astype("f4"),
+        }
+    )
+
+
+def iter_synthetic_catalog(n, chunksize=100000, seed=0, **catalog_kwargs):
+    """
+    Yield a synthetic catalog of `n` rows as DataFrames of at most
+    `chunksize` rows, so that catalogs too large to hold in memory can be
+    generated.
+    """
+    for i, start in enumerate(range(0, n, chunksize)):
+        yield synthetic_catalog(
+            min(chunksize, n - start),
+            seed=(seed, i),
+            first_hr=start + 1,
+            **catalog_kwargs,
+        )
+
+
+# global attributes of a lesson 6 LUN file, minus the ones that vary
+LUN_ATTRIBUTES = {
+    "instrument_type": "GOES R Series Advanced Baseline Imager",
+    "license": "CC0 (synthetic data)",
+    "institution": "Knowing the Sky synthetic data",
+    "title": "Synthetic ABI Lunar Scan Sample Data",
+}
+ORBITAL_SLOTS = {"G16": "GOES-East", "G17": "GOES-West", "G18": "GOES-West"}
+
+
+def synthetic_moon_table(
+    n,
+    shape=(676, 2808),
+    seed=0,
+    radius_range=(40, 120),
+    brightness_range=(40, 150),
+    noise=2.0,
+    scanline_fraction=0.02,
+    scanline_amplitude=30.0,
+    clip_fraction=0.05,
+    start="2019-01-01",
+    satellites=("G16", "G17", "G18"),
+):
+    """
+    Random parameters, and so the ground truth, for `n` synthetic LUN
+    frames of `shape`: one row per frame with the GOES-style 'name',
+    'utc', 'satellite', and the Moon's 'illuminated_fraction' (0-1),
+    center ('cy', 'cx'), 'radius', 'position_angle' (of the sunlit
+    limb, in degrees), 'brightness', plus the frame's 'noise' level,
+    'scanline_fraction' and 'scanline_amplitude' (the fraction of rows
+    given a random offset of up to that amplitude), and 'clipped'
+    (whether the disk runs off the edge of the frame, which about
+    `clip_fraction` of them do). Frames are a minute apart from `start`.
+    """
+    # one row of uniform draws per frame, so that frame i gets the same
+    # parameters whatever `n` is, and files written for a smaller table
+    # can be reused for a bigger one
+    draws = np.random.default_rng(seed).random((n, 10)).T
+
+    def scaled(draw, low, high):
+        return low + (high - low) * draw
+
+    radius = scaled(draws[0], *radius_range)
+    clipped = draws[1] < clip_fraction
+    # keep unclipped disks at least 10 pixels clear of the edges, and
+    # push clipped ones a random part of their radius past one edge
+    margin = radius + 10
+    cy = scaled(draws[2], margin, shape[0] - margin)
+    cx = scaled(draws[3], margin, shape[1] - margin)
+    overhang = scaled(draws[4], 0.1, 0.9) * radius
+    edge = (draws[5] * 4).astype(int)
+    cy = np.where(clipped & (edge == 0), overhang - radius, cy)
+    cy = np.where(clipped & (edge == 1), shape[0] - overhang + radius, cy)
+    cx = np.where(clipped & (edge == 2), overhang - radius, cx)
+    cx = np.where(clipped & (edge == 3), shape[1] - overhang + radius, cx)
+    utc = pd.Timestamp(start, tz="UTC") + pd.to_timedelta(
+        np.arange(n), unit="min"
+    )
+    satellite = np.asarray(satellites)[
+        (draws[6] * len(satellites)).astype(int)
+    ]
+    codes = utc.strftime("%Y%j%H%M%S") + "0"
+    names = [
+        f"OR_ABI-INST-CAL-LUN-M3C01_{sat}_s{code}_e{code}_c{code}-t0-s0.nc"
+        for sat, code in zip(satellite, codes)
+    ]
+    return pd.DataFrame(
+        {
+            "name": names,
+            "utc": utc,
+            "satellite": satellite,
+            "illuminated_fraction": scaled(draws[7], 0.05, 1),
+            "cy": cy,
+            "cx": cx,
+            "radius": radius,
+            "position_angle": scaled(draws[8], 0, 360),
+            "brightness": scaled(draws[9], *brightness_range),
+            "noise": noise,
+            "scanline_fraction": scanline_fraction,
+            "scanline_amplitude": scanline_amplitude,
+            "clipped": clipped,
+        }
+    )
+
+
+def moon_disk(shape, cy, cx, radius, illuminated_fraction, position_angle):
+    """
+    Boolean mask of the sunlit part of a Moon of `radius` pixels centered
+    at (`cy`, `cx`), with the given fraction of its disk lit. The
+    terminator is the projected half-ellipse that makes the lit area
+    exactly `illuminated_fraction` of the disk, with the sunlit limb
+    facing `position_angle` degrees counterclockwise from +x.
+    """
+    y, x = np.ogrid[:shape[0], :shape[1]]
+    angle = np.radians(position_angle)
+    # coordinates in Moon radii, u toward the Sun and v along the cusps
+    dy, dx = (y - cy) / radius, (x - cx) / radius
+    u = dx * np.cos(angle) - dy * np.sin(angle)
+    v = dx * np.sin(angle) + dy * np.cos(angle)
+    chord = 1 - u ** 2 - v ** 2
+    terminator = (1 - 2 * illuminated_fraction) * np.sqrt(
+        np.clip(1 - v ** 2, 0, None)
+    )
+    return (chord > 0) & (u > terminator)
+
+
+def render_moon_frame(frame, shape=(676, 2808), seed=0):
+    """
+    Radiance image (float32) for one row of synthetic_moon_table(): the
+    lit disk at its brightness, Gaussian noise, and scanline offsets.
+    """
+    rng = np.random.default_rng(seed)
+    lit = moon_disk(
+        shape,
+        frame["cy"],
+        frame["cx"],
+        frame["radius"],
+        frame["illuminated_fraction"],
+        frame["position_angle"],
+    )
+    image = rng.normal(0, frame["noise"], shape).astype("f4")
+    image[lit] += frame["brightness"]
+    scanlines = rng.random(shape[0]) < frame["scanline_fraction"]
+    image[scanlines] += rng.uniform(
+        -frame["scanline_amplitude"],
+        frame["scanline_amplitude"],
+        (scanlines.sum(), 1),
+    ).astype("f4")
+    return image
+
+
+def iter_synthetic_moons(table, shape=(676, 2808), seed=0):
+    """
+    Yield (row, image) for each row of a synthetic_moon_table(). Each
+    frame's noise is seeded by its position in the full table (its
+    index), so subsets of a table render the same images.
+    """
+    for i, frame in zip(table.index, table.to_dict("records")):
+        yield frame, render_moon_frame(frame, shape, seed=(seed, i))
+
+
+def write_lun_netcdf(path, radiance, frame):
+    """
+    Write `radiance` to `path` with the variable, dimension and global
+    attribute layout of the lesson 6 LUN files, using the 'utc' and
+    'satellite' of `frame` (a row of synthetic_moon_table()). The
+    radiance is zlib-compressed, though the noise keeps it from shrinking
+    much.
+    """
+    timestamp = frame["utc"].strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    with Dataset(path, "w") as nc:
+        nc.setncatts(
+            LUN_ATTRIBUTES
+            | {
+                "orbital_slot": ORBITAL_SLOTS.get(frame["satellite"], ""),
+                "platform_ID": frame["satellite"],
+                "instrument_ID": "synthetic",
+                "time_coverage_start": timestamp,
+                "time_coverage_end": timestamp,
+                "date_created": timestamp,
+            }
+        )
+        nc.createDimension("lines", radiance.shape[0])
+        nc.createDimension("samples", radiance.shape[1])
+        variable = nc.createVariable(
+            "radiance",
+            "f4",
+            ("lines", "samples"),
+            zlib=True,
+            fill_value=False,
+        )
+        variable[:] = radiance
+
+
+def write_synthetic_lun(folder, table, shape=(676, 2808), seed=0):
+    """
+    Render every frame of `table` (from synthetic_moon_table()) and write
+    it to `folder` under its 'name'. Returns the paths written.
+    """
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for frame, image in iter_synthetic_moons(table, shape, seed):
+        paths.append(folder / frame["name"])
+        write_lun_netcdf(paths[-1], image, frame)
+    return paths
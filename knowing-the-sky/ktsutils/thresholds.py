@@ -0,0 +1,225 @@
+"""
+Per-frame thresholds for make_outline(), chosen from cached radiance
+histograms instead of by hand.
+
+build_histogram_cache() reads each frame once and keeps only a
+fixed-size histogram of its radiance (plus the range it spans). Every
+threshold selector below works on those histograms alone, for all
+frames at once, so trying a different method or setting across
+thousands of frames takes milliseconds and never touches the pixels
+again:
+
+    otsu:       the cut that best separates the histogram into two
+                classes (Otsu 1979)
+    percentile: the value `q` percent of pixels fall at or below
+    sigma:      the background level plus `n_sigma` robust standard
+                deviations (median and scaled median absolute deviation
+                of the frame; the Moon covers too few pixels to move
+                either much)
+
+Medians and percentiles are exact to within one histogram bin, i.e.
+(max - min) / `bins` of each frame.
+"""
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from ktsutils.fullness import load_goes_image
+from ktsutils.stream import read_ahead
+
+HISTOGRAM_BINS = 1024
+CACHE_VERSION = 1
+# scales a median absolute deviation to a normal standard deviation
+MAD_TO_SIGMA = 1.4826
+
+
+def frame_histogram(image, bins=HISTOGRAM_BINS):
+    """
+    Histogram of the finite values of `image` over `bins` equal bins
+    spanning their range. Returns a dict with 'low', 'high', 'pixels'
+    (the number of finite values) and 'counts'.
+    """
+    values = np.asarray(image).ravel()
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return {
+            "low": np.nan,
+            "high": np.nan,
+            "pixels": 0,
+            "counts": np.zeros(bins, dtype=np.int64),
+        }
+    low, high = float(values.min()), float(values.max())
+    counts, _ = np.histogram(values, bins=bins, range=(low, high))
+    return {"low": low, "high": high, "pixels": values.size, "counts": counts}
+
+
+def _file_stats(paths):
+    records = []
+    for path in paths:
+        stat = os.stat(path)
+        records.append(
+            {
+                "name": Path(path).name,
+                "path": str(path),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+            }
+        )
+    return pd.DataFrame(records, columns=["name", "path", "size", "mtime"])
+
+
+def _histogram_records(paths, bins, loader, max_in_flight, n_threads):
+    records = []
+    for frame in read_ahead(paths, loader, max_in_flight, n_threads):
+        record = {"name": frame["name"], "error": frame.get("error")}
+        if "image" in frame:
+            record |= frame_histogram(frame["image"], bins)
+        else:
+            record |= frame_histogram(np.empty(0), bins)
+        records.append(record)
+    return pd.DataFrame(
+        records, columns=["name", "low", "high", "pixels", "counts", "error"]
+    )
+
+
+def build_histogram_cache(
+    paths,
+    cache_path=None,
+    bins=HISTOGRAM_BINS,
+    loader=load_goes_image,
+    max_in_flight=4,
+    n_threads=1,
+):
+    """
+    Histogram every file in `paths` with frame_histogram(). Returns a
+    DataFrame with one row per file: 'name', 'size', 'mtime', 'low',
+    'high', 'pixels', 'counts' (an array of `bins` counts) and 'error'
+    (None, or why the file couldn't be read).
+
+    If `cache_path` is given, the histograms are saved there as Parquet,
+    and an existing cache at that path is reused for files whose size
+    and modification time haven't changed, so only new or modified
+    files are read.
+
+    Files are read with `loader` in `n_threads` background threads (see
+    ktsutils.stream.read_ahead()), so a custom loader that reads NetCDF
+    files must hold ktsutils.fullness.NETCDF_LOCK while it does, like
+    load_goes_image().
+    """
+    files = _file_stats(paths)
+    old = None
+    if cache_path is not None and Path(cache_path).exists():
+        old = pd.read_parquet(cache_path)
+        if old.attrs.get("version") != CACHE_VERSION or (
+            old.attrs.get("bins") != bins
+        ):
+            old = None
+    if old is not None:
+        merged = files.merge(
+            old[["name", "size", "mtime"]], how="left", indicator=True
+        )
+        unchanged = (merged["_merge"] == "both").to_numpy()
+        kept = old.loc[old["name"].isin(files.loc[unchanged, "name"])]
+        todo = files.loc[~unchanged]
+    else:
+        kept, todo = None, files
+    fresh = _histogram_records(
+        todo["path"], bins, loader, max_in_flight, n_threads
+    )
+    fresh = todo[["name", "size", "mtime"]].merge(fresh, on="name")
+    cache = pd.concat([kept, fresh]) if kept is not None else fresh
+    cache = cache.sort_values("name").reset_index(drop=True)
+    if cache_path is not None:
+        cache.attrs |= {"version": CACHE_VERSION, "bins": bins}
+        cache.to_parquet(cache_path, index=False)
+    return cache
+
+
+def _unpack(histograms):
+    """Counts as an (n_frames, bins) array, and each frame's bin edges."""
+    counts = np.stack(histograms["counts"].to_numpy()).astype(np.float64)
+    low = histograms["low"].to_numpy(np.float64)[:, None]
+    high = histograms["high"].to_numpy(np.float64)[:, None]
+    steps = np.linspace(0, 1, counts.shape[1] + 1)
+    return counts, low + (high - low) * steps
+
+
+def _quantiles(counts, edges, fractions):
+    """
+    Per-frame values below which `fractions` (one per frame) of the
+    pixels fall, interpolating linearly within bins.
+    """
+    cumulative = np.cumsum(counts, axis=1)
+    total = cumulative[:, -1]
+    targets = np.asarray(fractions) * total
+    bins = (cumulative < targets[:, None]).sum(axis=1)
+    bins = np.minimum(bins, counts.shape[1] - 1)
+    rows = np.arange(len(counts))
+    below = np.where(bins > 0, cumulative[rows, bins - 1], 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        within = np.clip((targets - below) / counts[rows, bins], 0, 1)
+    within = np.nan_to_num(within)
+    width = edges[rows, bins + 1] - edges[rows, bins]
+    values = edges[rows, bins] + within * width
+    return np.where(total > 0, values, np.nan)
+
+
+def otsu_threshold(counts, edges):
+    """
+    Otsu's threshold for each frame: the bin edge that maximizes the
+    between-class variance of the pixels below and above it.
+    """
+    centers = (edges[:, 1:] + edges[:, :-1]) / 2
+    total = counts.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weight = np.cumsum(counts, axis=1) / total
+        mean = np.cumsum(counts * centers, axis=1) / total
+        overall = mean[:, -1:]
+        between = (overall * weight - mean) ** 2 / (weight * (1 - weight))
+    between = np.nan_to_num(between[:, :-1], nan=-1, posinf=-1)
+    cut = between.argmax(axis=1)
+    thresholds = edges[np.arange(len(counts)), cut + 1]
+    return np.where(total[:, 0] > 0, thresholds, np.nan)
+
+
+def percentile_threshold(counts, edges, q=99.5):
+    """The value `q` percent of each frame's pixels are at or below."""
+    return _quantiles(counts, edges, np.full(len(counts), q / 100))
+
+
+def sigma_threshold(counts, edges, n_sigma=5):
+    """
+    Each frame's median plus `n_sigma` times its robust standard
+    deviation (MAD_TO_SIGMA times the median absolute deviation).
+    """
+    median = _quantiles(counts, edges, np.full(len(counts), 0.5))
+    centers = (edges[:, 1:] + edges[:, :-1]) / 2
+    deviations = np.abs(centers - median[:, None])
+    order = np.argsort(deviations, axis=1)
+    deviations = np.take_along_axis(deviations, order, axis=1)
+    cumulative = np.cumsum(np.take_along_axis(counts, order, axis=1), axis=1)
+    half = (cumulative < cumulative[:, -1:] / 2).sum(axis=1)
+    half = np.minimum(half, counts.shape[1] - 1)
+    mad = deviations[np.arange(len(counts)), half]
+    return median + n_sigma * MAD_TO_SIGMA * mad
+
+
+THRESHOLD_METHODS = {
+    "otsu": otsu_threshold,
+    "percentile": percentile_threshold,
+    "sigma": sigma_threshold,
+}
+
+
+def frame_thresholds(histograms, method="otsu", **kwargs):
+    """
+    A threshold for every frame in `histograms` (the output of
+    build_histogram_cache()), chosen with one of THRESHOLD_METHODS and
+    its keyword arguments. Returns a Series indexed by file name; frames
+    with no valid pixels get NaN.
+    """
+    counts, edges = _unpack(histograms)
+    thresholds = THRESHOLD_METHODS[method](counts, edges, **kwargs)
+    return pd.Series(thresholds, index=histograms["name"], name=method)
@@ -0,0 +1,242 @@
+"""
+Paginated, streaming catalog fetching.
+
+`Vizier(row_limit=99999).get_catalogs(...)` is fine for the Bright Star
+Catalog, but it pulls the whole table into memory at once, which won't
+work for Hipparcos- or Gaia-sized catalogs. The functions here instead
+fetch a catalog one page at a time from VizieR's TAP service and write
+each page to a Parquet file as it arrives, so memory use is bounded by
+the page size rather than the catalog size.
+
+Pages are selected by a unique, sortable key column (like 'HR' for the
+BSC, 'HIP' for Hipparcos, or 'Source' for Gaia): each query asks for the
+next `page_size` rows with a key greater than the last one we saw. This
+is faster and more reliable than OFFSET-style paging, and it also means
+an interrupted download can be resumed.
+
+Anything that implements the page-fetcher interface -- a callable with
+the signature `fetch_page(table, key, page_size, after, columns)` that
+returns a DataFrame -- can stand in for the TAP service.
+`frame_page_fetcher()` makes one from a local DataFrame.
+"""
+import io
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+
+from ktsutils.catalog import apply_schema
+
+TAPVIZIER_URL = "https://tapvizier.cds.unistra.fr/TAPVizieR/tap/sync"
+
+
+def _adql_literal(value):
+    """`value` as an ADQL literal: quoted if it's a string, else a number."""
+    if isinstance(value, bytes):
+        value = value.decode()
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    # str(), not repr(), so numpy scalars come out as plain numbers
+    return str(value)
+
+
+def keyset_query(table, key, page_size, after=None, columns=None):
+    """
+    ADQL for one page of `table`: the first `page_size` rows, ordered by
+    `key`, whose `key` is greater than `after`.
+    """
+    selection = "*" if columns is None else ", ".join(
+        f'"{c}"' for c in columns
+    )
+    where = ""
+    if after is not None:
+        where = f' WHERE "{key}" > {_adql_literal(after)}'
+    return (
+        f'SELECT TOP {int(page_size)} {selection} FROM "{table}"{where} '
+        f'ORDER BY "{key}"'
+    )
+
+
+def tap_page_fetcher(url=TAPVIZIER_URL, session=None, timeout=300):
+    """
+    Make a page fetcher that sends synchronous ADQL queries to the TAP
+    service at `url` (by default, VizieR's) and parses the CSV responses.
+    """
+    session = requests.Session() if session is None else session
+
+    def fetch_page(table, key, page_size, after, columns):
+        response = session.post(
+            url,
+            data={
+                "REQUEST": "doQuery",
+                "LANG": "ADQL",
+                "FORMAT": "csv",
+                "QUERY": keyset_query(table, key, page_size, after, columns),
+            },
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        return pd.read_csv(io.StringIO(response.text))
+
+    return fetch_page
+
+
+def frame_page_fetcher(catalog):
+    """
+    Make a page fetcher that serves pages from a local DataFrame, with the
+    same semantics as `tap_page_fetcher()`. Useful as a stand-in for the
+    TAP service, or for re-chunking a catalog you already have.
+    """
+    def fetch_page(table, key, page_size, after, columns):
+        rows = catalog if after is None else catalog.loc[catalog[key] > after]
+        page = rows.sort_values(key).head(page_size)
+        if columns is not None:
+            page = page[list(columns)]
+        return page.reset_index(drop=True)
+
+    return fetch_page
+
+
+def iter_catalog_pages(
+    table,
+    key,
+    page_size=50000,
+    columns=None,
+    fetch_page=None,
+    schema=None,
+    after=None,
+):
+    """
+    Yield a catalog as a series of DataFrames of at most `page_size` rows,
+    in order of `key`. If `schema` is given (see ktsutils.catalog), it is
+    applied to each page. Pass `after` to start after a particular key
+    value (e.g. to resume an interrupted fetch).
+    """
+    fetch_page = tap_page_fetcher() if fetch_page is None else fetch_page
+    if columns is not None and key not in columns:
+        columns = [key, *columns]
+    while True:
+        page = fetch_page(table, key, page_size, after, columns)
+        if len(page) == 0:
+            return
+        after = page[key].iloc[-1:].tolist()[0]
+        yield page if schema is None else apply_schema(page, schema)
+        if len(page) < page_size:
+            return
+
+
+def _to_arrow(page, arrow_schema):
+    # categories can differ from page to page, so store their values
+    page = page.copy()
+    for column in page.columns[page.dtypes == "category"]:
+        page[column] = page[column].astype("string")
+    return pa.Table.from_pandas(
+        page, schema=arrow_schema, preserve_index=False
+    )
+
+
+def _cached_rows(path):
+    """Rows in a readable, non-empty Parquet file at `path`, else 0."""
+    try:
+        metadata = pq.ParquetFile(path).metadata
+    except (OSError, pa.ArrowException):
+        return 0
+    return metadata.num_rows if metadata.num_row_groups > 0 else 0
+
+
+def _resume_source(*paths):
+    """
+    Of the files an earlier cache_catalog() call may have left, the one
+    holding the most rows (they're all prefixes of the same key-ordered
+    catalog), or None if none of them holds any.
+    """
+    rows = {path: _cached_rows(path) for path in paths if path.exists()}
+    rows = {path: n for path, n in rows.items() if n > 0}
+    return max(rows, key=rows.get) if rows else None
+
+
+def cache_catalog(
+    table,
+    key,
+    cache_path,
+    page_size=50000,
+    columns=None,
+    fetch_page=None,
+    schema=None,
+    resume=False,
+):
+    """
+    Stream a catalog into a Parquet file at `cache_path`, one row group per
+    page, without ever holding more than one page in memory. Returns the
+    number of rows written.
+
+    Every page is cast to the column types of the first page, so pass a
+    `schema` if the catalog has columns whose type pandas might infer
+    differently from page to page (e.g. mostly-blank ones).
+
+    Pages are written to `<cache_path>.partial`, which only replaces
+    `cache_path` once the whole catalog has been fetched. If `resume` is
+    True, keeps the rows already fetched, by an earlier complete or
+    interrupted call, and fetches only rows after the last key.
+    """
+    cache_path, after, writer, n_rows = Path(cache_path), None, None, 0
+    partial = cache_path.with_name(f"{cache_path.name}.partial")
+    resumed = cache_path.with_name(f"{cache_path.name}.resume")
+    pages = []
+    source = _resume_source(cache_path, partial, resumed) if resume else None
+    if source is not None:
+        if source == partial:
+            # we're about to write a new partial file, so move this aside
+            partial.replace(resumed)
+            source = resumed
+        existing = pq.ParquetFile(source)
+        last_group = existing.metadata.num_row_groups - 1
+        after = existing.read_row_group(last_group, columns=[key])[key][-1]
+        after = after.as_py()
+        # copy the existing row groups into the new file first
+        pages = (
+            existing.read_row_group(i)
+            for i in range(existing.metadata.num_row_groups)
+        )
+    try:
+        for group in pages:
+            if writer is None:
+                writer = pq.ParquetWriter(partial, group.schema)
+            writer.write_table(group)
+            n_rows += group.num_rows
+        for page in iter_catalog_pages(
+            table, key, page_size, columns, fetch_page, schema, after
+        ):
+            arrow_page = _to_arrow(
+                page, None if writer is None else writer.schema
+            )
+            if writer is None:
+                writer = pq.ParquetWriter(partial, arrow_page.schema)
+            writer.write_table(arrow_page)
+            n_rows += len(page)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is not None:
+        partial.replace(cache_path)
+    resumed.unlink(missing_ok=True)
+    return n_rows
+
+
+def iter_cached_catalog(cache_path, columns=None, schema=None):
+    """
+    Yield a catalog cached by `cache_catalog()` one page (row group) at a
+    time, optionally applying `schema` to each.
+    """
+    cached = pq.ParquetFile(cache_path)
+    for i in range(cached.metadata.num_row_groups):
+        page = cached.read_row_group(i, columns=columns).to_pandas()
+        yield page if schema is None else apply_schema(page, schema)
+
+
+def read_cached_catalog(cache_path, columns=None, schema=None):
+    """Read an entire catalog cached by `cache_catalog()` into memory."""
+    catalog = pd.read_parquet(cache_path, columns=columns)
+    return catalog if schema is None else apply_schema(catalog, schema)
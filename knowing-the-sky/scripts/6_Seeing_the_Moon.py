@@ -596,15 +596,23 @@ len(cv2.findContours(mask.astype('u1'), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMP
 """
 
 # %%
+def read_start_time(path):
+    # the 'with' block makes sure we close each file after reading it
+    with Dataset(path) as nc:
+        return nc.time_coverage_start
+
+
 def get_time_metadata():
     """
     Extract time metadata from the NetCDF files so that we can get the 
     'offical' percent illumination of the Moon at each of those times
-    from JPL using LHorizon.
+    from JPL using LHorizon. (For much bigger archives,
+    ktsutils.goes.build_file_index() does this in parallel and saves
+    the results, so it only has to look at new files next time.)
     """
     return [
-        {'name': f.name, 'utc': Dataset(f).time_coverage_start}    
-        for f in [f for f in LUN_FOLDER.iterdir() if f.suffix == ".nc"]
+        {'name': f.name, 'utc': read_start_time(f)}
+        for f in LUN_FOLDER.iterdir() if f.suffix == ".nc"
     ]
 
 
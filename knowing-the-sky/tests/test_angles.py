@@ -0,0 +1,36 @@
+"""ktsutils.angles vs. astropy.coordinates.Angle."""
+from astropy.coordinates import Angle
+import numpy as np
+import pytest
+
+from ktsutils.angles import dms_to_degrees, hms_to_degrees
+from ktsutils.synthetic import random_sexagesimal
+
+
+@pytest.mark.parametrize(
+    "kind, decode, unit",
+    [("ra", hms_to_degrees, "hour"), ("dec", dms_to_degrees, "deg")],
+)
+@pytest.mark.parametrize("as_bytes", [True, False])
+def test_matches_angle(kind, decode, unit, as_bytes):
+    strings = random_sexagesimal(10000, kind, seed=1)
+    if not as_bytes:
+        strings = strings.astype("U")
+    expected = Angle(strings.astype("U"), unit=unit).degree
+    assert np.array_equal(decode(strings), expected)
+
+
+def test_irregular_rows_match_angle():
+    # leading spaces, a negative zero, another separator and a different
+    # number of digits take different paths through the decoder
+    strings = ["+45 13 45", " 5 10 20", "-00 30 00", "+12:30:15", "+5 1 2.5"]
+    expected = Angle(strings, unit="deg").degree
+    assert np.array_equal(dms_to_degrees(strings), expected)
+
+
+def test_blank_and_missing_rows_are_nan():
+    strings = np.array(["00 05 09.9", "", None, np.nan, "23 59 59.9"], object)
+    out = hms_to_degrees(strings)
+    assert np.isnan(out[1:4]).all()
+    expected = Angle(["00 05 09.9", "23 59 59.9"], unit="hour").degree
+    assert np.array_equal(out[[0, 4]], expected)
@@ -0,0 +1,49 @@
+"""ktsutils.labels.label_index() vs. per-label np.nonzero() scans."""
+import numpy as np
+import pytest
+import scipy.ndimage as ndi
+
+from ktsutils.labels import label_index, label_pixels
+
+
+@pytest.fixture
+def labels():
+    # a noisy thresholded frame: hundreds of blobs of every shape
+    frame = np.random.default_rng(0).random((120, 90)) > 0.6
+    labels, _ = ndi.label(frame)
+    return labels
+
+
+def test_pixels_match_nonzero(labels):
+    index = label_index(labels)
+    for label in range(1, labels.max() + 1):
+        y_indices, x_indices = np.nonzero(labels == label)
+        pixels = label_pixels(index, label)
+        assert np.array_equal(pixels["y"], y_indices)
+        assert np.array_equal(pixels["x"], x_indices)
+
+
+def test_areas_boxes_and_centroids(labels):
+    index = label_index(labels)
+    n_labels = labels.max()
+    assert np.array_equal(
+        index["area"], np.bincount(labels.ravel(), minlength=n_labels + 1)
+    )
+    for label in range(n_labels + 1):
+        y_indices, x_indices = np.nonzero(labels == label)
+        assert index["min_y"][label] == y_indices.min()
+        assert index["max_y"][label] == y_indices.max()
+        assert index["min_x"][label] == x_indices.min()
+        assert index["max_x"][label] == x_indices.max()
+        assert index["centroid_y"][label] == pytest.approx(y_indices.mean())
+        assert index["centroid_x"][label] == pytest.approx(x_indices.mean())
+
+
+def test_labels_without_pixels():
+    labels = np.zeros((5, 5), dtype=int)
+    labels[1:3, 1:3] = 2
+    index = label_index(labels, n_labels=3)
+    assert list(index["area"]) == [21, 0, 4, 0]
+    assert index["min_y"][1] == index["max_x"][3] == -1
+    assert label_pixels(index, 1)["y"].size == 0
+    assert list(label_pixels(index, 2)["x"]) == [1, 2, 1, 2]
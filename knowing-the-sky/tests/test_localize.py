@@ -0,0 +1,60 @@
+"""localized_fullness() vs. the full-frame fullness_algorithm()."""
+import numpy as np
+import pytest
+
+from ktsutils.fullness import fullness_algorithm
+from ktsutils.localize import localized_fullness
+
+PARAMS = {
+    "threshold": 40,
+    "erosion_size": 3,
+    "min_width": 20,
+    "min_height": 20,
+    "edge_size": 5,
+    "dilation_size": 3,
+    "cutout_margin": 5,
+}
+
+
+def moon_frame(rng, shape=(300, 300), blobs=1):
+    """Noise, hot pixels, and `blobs` partly lit disks."""
+    frame = rng.normal(5, 2, shape).astype("f4")
+    y, x = np.ogrid[:shape[0], :shape[1]]
+    for _ in range(blobs):
+        radius = rng.integers(20, 40)
+        cy = rng.integers(radius, shape[0] - radius)
+        cx = rng.integers(radius, shape[1] - radius)
+        terminator = rng.integers(-radius, 0)
+        disk = (y - cy) ** 2 + (x - cx) ** 2 < radius ** 2
+        frame[disk & (x - cx > terminator)] += 100
+    frame.flat[rng.integers(0, frame.size, 50)] = 200
+    return frame
+
+
+def assert_same(full, local):
+    assert local["status"] == full["status"]
+    if full["status"] == "ok":
+        assert local["fullness"] == full["fullness"]
+        assert np.array_equal(local["moonmask"], full["moonmask"])
+
+
+@pytest.mark.parametrize("blobs", [0, 1, 2])
+def test_matches_full_frame(blobs):
+    rng = np.random.default_rng(blobs)
+    outcomes = set()
+    for _ in range(10):
+        frame = moon_frame(rng, blobs=blobs)
+        local = localized_fullness(frame, **PARAMS)
+        assert_same(fullness_algorithm(frame, **PARAMS), local)
+        outcomes.add((local["status"], local["mode"]))
+    if blobs == 1:
+        # make sure the ROI path found Moons, not just the fallback
+        assert ("ok", "coarse") in outcomes
+
+
+def test_falls_back_without_edge_rules():
+    frame = moon_frame(np.random.default_rng(3))
+    params = PARAMS | {"edge_size": None}
+    local = localized_fullness(frame, **params)
+    assert local["mode"] == "full"
+    assert_same(fullness_algorithm(frame, **params), local)
@@ -0,0 +1,56 @@
+"""Round trips and logical operations of ktsutils.masks."""
+import numpy as np
+import pytest
+
+from ktsutils.masks import (
+    PackedMask,
+    packed_to_rle,
+    rle_count,
+    rle_decode,
+    rle_encode,
+    rle_to_packed,
+)
+
+
+def disk(shape, cy, cx, radius):
+    y, x = np.ogrid[:shape[0], :shape[1]]
+    return (y - cy) ** 2 + (x - cx) ** 2 < radius ** 2
+
+
+rng = np.random.default_rng(0)
+MASKS = {
+    "empty": np.zeros((7, 9), bool),
+    "full": np.ones((7, 9), bool),
+    "noise": rng.random((13, 7)) > 0.5,
+    "disk": disk((40, 50), 20, 25, 12),
+    "corners": np.pad(np.zeros((5, 5), bool), 1, constant_values=True),
+    "single row": rng.random((1, 11)) > 0.5,
+    "no pixels": np.zeros((0, 4), bool),
+}
+
+
+@pytest.mark.parametrize("mask", MASKS.values(), ids=MASKS.keys())
+def test_round_trips(mask):
+    packed = PackedMask.pack(mask)
+    assert packed.unpack().shape == mask.shape
+    assert np.array_equal(packed.unpack(), mask)
+    assert packed.count() == mask.sum()
+    rle = rle_encode(mask)
+    assert np.array_equal(rle_decode(rle), mask)
+    assert rle_count(rle) == mask.sum()
+    assert rle_to_packed(rle) == packed
+    assert np.array_equal(rle_decode(packed_to_rle(packed)), mask)
+
+
+def test_logical_operations():
+    a = rng.random((13, 7)) > 0.5
+    b = rng.random((13, 7)) > 0.3
+    pa, pb = PackedMask.pack(a), PackedMask.pack(b)
+    assert np.array_equal((pa & pb).unpack(), a & b)
+    assert np.array_equal((pa | pb).unpack(), a | b)
+    assert np.array_equal((pa ^ pb).unpack(), a ^ b)
+    # 91 pixels leave 5 padding bits, which must stay clear
+    assert np.array_equal((~pa).unpack(), ~a)
+    assert (~pa).count() == (~a).sum()
+    with pytest.raises(ValueError):
+        pa & PackedMask.pack(a.T)
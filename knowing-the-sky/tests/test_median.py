@@ -0,0 +1,57 @@
+"""Tiled and histogram median filters vs. ndi.median_filter()."""
+import numpy as np
+import pytest
+import scipy.ndimage as ndi
+
+from ktsutils.median import PAD_MODES, box_median_filter, tiled_median_filter
+
+
+@pytest.fixture
+def image():
+    return np.random.default_rng(0).integers(0, 256, (45, 38), dtype="u1")
+
+
+@pytest.mark.parametrize("mode", PAD_MODES)
+@pytest.mark.parametrize("size", [3, 4, (5, 2)])
+def test_tiled_matches_scipy(image, mode, size):
+    expected = ndi.median_filter(image, size=size, mode=mode, cval=7)
+    # tiles that don't divide the image, so edge tiles are ragged
+    out = tiled_median_filter(
+        image, size, mode=mode, cval=7, tile_shape=(16, 11), use_threads=True
+    )
+    assert np.array_equal(out, expected)
+
+
+def test_tiled_footprint_and_processes(image):
+    footprint = np.array([[0, 1, 0], [1, 1, 1], [0, 1, 1]], bool)
+    image = image.astype("f4")
+    expected = ndi.median_filter(image, footprint=footprint)
+    out = tiled_median_filter(
+        image, footprint=footprint, tile_shape=20, n_workers=2
+    )
+    assert np.array_equal(out, expected)
+
+
+@pytest.mark.parametrize("mode", PAD_MODES)
+@pytest.mark.parametrize("size", [3, 4, (7, 2), 50])
+def test_histogram_matches_scipy(image, mode, size):
+    expected = ndi.median_filter(image, size=size, mode=mode, cval=7)
+    assert np.array_equal(
+        box_median_filter(image, size, mode=mode, cval=7), expected
+    )
+
+
+def test_tiled_histogram_matches_scipy(image):
+    expected = ndi.median_filter(image, size=5)
+    out = tiled_median_filter(
+        image, 5, tile_shape=(16, 11), use_threads=True, method="histogram"
+    )
+    assert np.array_equal(out, expected)
+
+
+def test_histogram_rejects_many_levels():
+    image = np.random.default_rng(1).random((20, 20))
+    with pytest.raises(ValueError):
+        box_median_filter(image, 3, max_levels=100)
+    with pytest.raises(ValueError):
+        tiled_median_filter(image, footprint=np.eye(3), method="histogram")
@@ -0,0 +1,31 @@
+"""Box-footprint erosion and dilation vs. scipy.ndimage."""
+import numpy as np
+import pytest
+import scipy.ndimage as ndi
+
+from ktsutils.morphology import box_dilation, box_erosion
+
+# odd, even and non-square footprints, including ones wider than the image
+SIZES = [1, 2, 3, 4, 7, 16, (3, 5), (6, 1), 40]
+
+
+@pytest.fixture
+def image():
+    # blobs big enough to survive erosion, plus single-pixel noise
+    rng = np.random.default_rng(0)
+    image = ndi.uniform_filter(rng.random((37, 29)), 5) > 0.5
+    return image ^ (rng.random(image.shape) > 0.97)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_erosion_matches_scipy(image, size):
+    footprint = np.ones(np.broadcast_to(size, 2))
+    expected = ndi.binary_erosion(image, footprint)
+    assert np.array_equal(box_erosion(image, size), expected)
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_dilation_matches_scipy(image, size):
+    footprint = np.ones(np.broadcast_to(size, 2))
+    expected = ndi.binary_dilation(image, footprint)
+    assert np.array_equal(box_dilation(image, size), expected)